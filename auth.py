@@ -1,54 +1,182 @@
 # auth.py
+import json
 import os
-from typing import Optional
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from crewai import LLM
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import urlparse
 
-from config import SCOPES, logger
+import llm_cache
+from profiling import wrap_llm
+from users import current_user
+from config import (SCOPES, LLM_MODEL, LLM_CACHE, LLM_REPLAY, TOKEN_FILE, CREDENTIALS_FILE,
+                    TOKEN_REFRESH_MARGIN, GOOGLE_API_ROOT, logger)
+
+# crewai, httplib2 y los clientes de Google tardan en importarse: se importan donde se usan
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
 
 def get_llm():
-    """Retorna instancia LLM configurada."""
+    """Retorna instancia LLM configurada (con caché de respuestas si LLM_CACHE)."""
     api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
+    if not api_key and not LLM_REPLAY:
         raise ValueError("Falta GOOGLE_API_KEY en .env")
 
-    return LLM(
-        model="gemini/gemini-flash-latest",
+    from crewai import LLM
+    llm = LLM(
+        model=LLM_MODEL,
         verbose=True,
         temperature=0,
-        google_api_key=api_key
+        google_api_key=api_key or "replay"
     )
+    if LLM_CACHE or LLM_REPLAY: llm = llm_cache.wrap(llm)
+    return wrap_llm(llm)
+
+class CredentialManager:
+    """Credenciales OAuth en memoria, compartidas por todo el proceso.
+
+    Lee `token.json` una sola vez, refresca antes de que expire el token y solo
+    reescribe el fichero (de forma atómica) cuando el token cambia. Sin
+    `interactive` no abre el navegador: en el modo multiusuario un token
+    inválido deja a ese usuario sin fuentes de Google en vez de bloquear el lote.
+    """
+
+    def __init__(self, token_file: str = TOKEN_FILE, creds_file: str = CREDENTIALS_FILE,
+                 margin: int = TOKEN_REFRESH_MARGIN, interactive: bool = True):
+        self.token_file = token_file
+        self.creds_file = creds_file
+        self.margin = timedelta(seconds=margin)
+        self.interactive = interactive
+        self._creds: Optional["Credentials"] = None
+        self._lock = threading.Lock()
+
+    def _fresh(self) -> bool:
+        c = self._creds
+        if not c or not c.token: return False
+        # `expiry` es UTC naive en google-auth
+        return c.expiry is None or c.expiry - self.margin > datetime.utcnow()
+
+    def _save(self):
+        directorio = os.path.dirname(os.path.abspath(self.token_file))
+        fd, tmp = tempfile.mkstemp(dir=directorio, prefix=".token-", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(self._creds.to_json())
+            os.replace(tmp, self.token_file)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    def get(self) -> Optional["Credentials"]:
+        """Devuelve credenciales válidas durante al menos `margin` segundos."""
+        with self._lock:
+            if self._fresh(): return self._creds
+
+            from google.oauth2.credentials import Credentials
+            from google.auth.transport.requests import Request
+
+            if self._creds is None and os.path.exists(self.token_file):
+                self._creds = Credentials.from_authorized_user_file(self.token_file, SCOPES)
+                if self._fresh(): return self._creds
+
+            if self._creds and self._creds.refresh_token:
+                try:
+                    self._creds.refresh(Request())
+                    logger.info("🔄 Token refrescado.")
+                except Exception:
+                    logger.warning("⚠️ Token expirado. Re-autenticando...")
+                    self._creds = None
+            else:
+                self._creds = None
+
+            if not self._creds:
+                if not self.interactive:
+                    logger.error(f"❌ Token no válido en {self.token_file} (python main.py --login <usuario>)")
+                    return None
+                if not os.path.exists(self.creds_file):
+                    logger.error("❌ Falta credentials.json")
+                    return None
+
+                from google_auth_oauthlib.flow import InstalledAppFlow
+                flow = InstalledAppFlow.from_client_secrets_file(self.creds_file, SCOPES)
+                self._creds = flow.run_local_server(port=0)
+
+            self._save()
+            return self._creds
+
+_managers = {}
+_services = {}
+_services_lock = threading.Lock()
+_local = threading.local()
+
+def _http():
+    """`httplib2.Http` del hilo que publica cada petición en los hooks HTTP (tiempo, bytes, estado)."""
+    if not hasattr(_local, 'http'):
+        import httplib2
+        from tools.http_client import emit
+
+        class _TimedHttp(httplib2.Http):
+            def request(self, uri, method="GET", *args, **kwargs):
+                t0 = time.perf_counter()
+                evento = {"metodo": method, "host": urlparse(uri).netloc, "intento": 0}
+                try:
+                    resp, content = super().request(uri, method, *args, **kwargs)
+                except Exception as e:
+                    emit({**evento, "estado": None, "segundos": time.perf_counter() - t0, "bytes": 0, "error": str(e)})
+                    raise
+                emit({**evento, "estado": resp.status, "segundos": time.perf_counter() - t0, "bytes": len(content or b"")})
+                return resp, content
+
+        _local.http = _TimedHttp()
+    return _local.http
+
+def _manager() -> CredentialManager:
+    """Credenciales del usuario actual (token.json en modo de un solo usuario)."""
+    u = current_user()
+    token_file = (u or {}).get("token_file") or TOKEN_FILE
+    with _services_lock:
+        if token_file not in _managers:
+            _managers[token_file] = CredentialManager(token_file, interactive=u is None)
+        return _managers[token_file]
+
+def authenticate_google() -> Optional["Credentials"]:
+    """Maneja el flujo OAuth 2.0 (credenciales cacheadas en el proceso)."""
+    return _manager().get()
+
+def _request_builder(manager: CredentialManager):
+    def build(http, *args, **kwargs):
+        """Construye cada petición con un `Http` propio del hilo: httplib2 no es thread-safe."""
+        import google_auth_httplib2
+        from googleapiclient.http import HttpRequest
+
+        authed = google_auth_httplib2.AuthorizedHttp(manager.get(), http=_http())
+        return HttpRequest(authed, *args, **kwargs)
+    return build
+
+def get_service(api: str, version: str):
+    """Cliente de API cacheado por proceso y usuario, construido desde el documento de discovery empaquetado."""
+    manager = _manager()
+    clave = (manager.token_file, api, version)
+    with _services_lock:
+        if clave not in _services:
+            creds = manager.get()
+            if not creds: return None
+            from googleapiclient import discovery_cache
+            from googleapiclient.discovery import build, build_from_document
+            if GOOGLE_API_ROOT:
+                doc = json.loads(discovery_cache.get_static_doc(api, version))
+                doc["rootUrl"] = GOOGLE_API_ROOT
+                _services[clave] = build_from_document(doc, credentials=creds, requestBuilder=_request_builder(manager))
+            else:
+                _services[clave] = build(
+                    api, version, credentials=creds, requestBuilder=_request_builder(manager),
+                    static_discovery=True, cache_discovery=False
+                )
+        return _services[clave]
 
-def authenticate_google() -> Optional[Credentials]:
-    """Maneja el flujo OAuth 2.0."""
-    creds = None
-    token_file = 'token.json'
-    creds_file = 'credentials.json'
-
-    if os.path.exists(token_file):
-        creds = Credentials.from_authorized_user_file(token_file, SCOPES)
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-                logger.info("🔄 Token refrescado.")
-            except Exception:
-                logger.warning("⚠️ Token expirado. Re-autenticando...")
-                creds = None
-
-        if not creds:
-            if not os.path.exists(creds_file):
-                logger.error("❌ Falta credentials.json")
-                return None
-            
-            flow = InstalledAppFlow.from_client_secrets_file(creds_file, SCOPES)
-            creds = flow.run_local_server(port=0)
-
-        with open(token_file, 'w') as token:
-            token.write(creds.to_json())
-
-    return creds
\ No newline at end of file
+def login(usuario: dict) -> bool:
+    """Flujo OAuth interactivo para crear el token de un usuario del registro."""
+    os.makedirs(os.path.dirname(os.path.abspath(usuario["token_file"])), exist_ok=True)
+    return CredentialManager(usuario["token_file"]).get() is not None
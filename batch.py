@@ -0,0 +1,74 @@
+# batch.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from collector import build_sources, collect
+from config import BATCH_WORKERS, PIPELINE_MODE, WATCHLIST, NEWS_QUERIES, TRANSPORT_LINES, logger
+from profiling import profiler, propagate
+from users import load_users, use
+
+# Fuentes iguales para todos salvo por sus parámetros: se consultan una vez por lote
+COMPARTIDAS = {"transporte": ("transport_lines", TRANSPORT_LINES),
+               "bolsa": ("watchlist", WATCHLIST),
+               "noticias": ("news_queries", NEWS_QUERIES)}
+
+def shared_user(usuarios: list) -> dict:
+    """Usuario sintético con la unión de los parámetros de las fuentes compartidas.
+
+    No tiene `id`, así que su estado va al almacén compartido.
+    """
+    return {clave: list(dict.fromkeys(v for u in usuarios for v in (u.get(clave) or default)))
+            for clave, default in COMPARTIDAS.values()}
+
+def _select(fuente: str, raw: str, usuario: dict) -> str:
+    """Parte del resultado compartido que corresponde a `usuario`."""
+    clave, default = COMPARTIDAS[fuente]
+    valores = usuario.get(clave) or default
+    if fuente == "transporte":
+        from tools.transport import select_lines
+        return select_lines(raw, ",".join(valores))
+    from tools.market import select_quotes, select_news
+    return select_quotes(raw, valores) if fuente == "bolsa" else select_news(raw, valores)
+
+def _briefing(usuario: dict, mode: str, compartidos: dict) -> str:
+    from pipeline import run_briefing
+
+    with use(usuario), profiler.span(f"user:{usuario['id']}", "usuario"):
+        fuentes = build_sources()
+        propias = {k: fn for k, fn in fuentes.items() if k not in COMPARTIDAS}
+        datos = collect(propias) if propias else {}
+        for fuente in fuentes.keys() & compartidos.keys():
+            datos[fuente] = _select(fuente, compartidos[fuente], usuario)
+        return run_briefing(usuario.get("mode") or mode, datos)
+
+def run_batch(mode: str = PIPELINE_MODE, usuarios: list = None, workers: int = BATCH_WORKERS) -> dict:
+    """Briefings de todos los usuarios del registro en un solo proceso.
+
+    Transporte, cotizaciones y noticias se piden una vez para la unión de los
+    parámetros de todos y se reparten filtrados; correo, agenda y tareas se
+    leen con el token de cada usuario. Los usuarios se procesan de `workers`
+    en `workers`. Devuelve el estado de cada uno ("ok" o el error).
+    """
+    usuarios = usuarios if usuarios is not None else load_users()
+    if not usuarios: return {}
+    inicio = time.monotonic()
+
+    with use(shared_user(usuarios)):
+        fuentes = {k: fn for k, fn in build_sources().items() if k in COMPARTIDAS}
+    with profiler.span("collect:compartidas"):
+        compartidos = collect(fuentes) if fuentes else {}
+
+    estados = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(usuarios))), thread_name_prefix="user") as pool:
+        futuros = {u["id"]: pool.submit(propagate(_briefing), u, mode, compartidos) for u in usuarios}
+    for uid, futuro in futuros.items():
+        try:
+            futuro.result()
+            estados[uid] = "ok"
+        except Exception as e:
+            logger.error(f"🔥 Briefing de '{uid}' fallido: {e}")
+            estados[uid] = f"error: {e}"
+
+    ok = sum(e == "ok" for e in estados.values())
+    logger.info(f"👥 Lote completado en {time.monotonic() - inicio:.1f}s: {ok}/{len(estados)} usuarios.")
+    return estados
@@ -0,0 +1,238 @@
+# bench/e2e_bench.py
+"""Benchmark de extremo a extremo con todos los servicios externos simulados en local.
+
+Uso: python -m bench.e2e_bench [--correos 10] [--tickers 1] [--latencia 0.05] [--llm-latencia 0.2]
+                               [--reps 5] [--escenarios herramientas,recoleccion,directo,crew] [--frio]
+
+Levanta Gmail/Calendar/Tasks, tmpmurcia, Google News y Telegram falsos y un
+LLM guionizado, y mide cada herramienta, la recolección, el modo directo y
+`create_crew().kickoff()`. Informa de la primera ejecución con las cachés
+vacías (frío), p50/p95 del resto, el pico de RSS y las llamadas por ejecución.
+
+yfinance no permite cambiar de endpoint: `market.yf` se sustituye por un
+doble con la misma interfaz (`download`, `Ticker().info`) y la misma latencia,
+de modo que la caché y el parseo de `tools/market.py` se ejercitan igual.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import resource
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from bench.fake_services import FakeGoogle, FakeNews, FakeTelegram, FakeTransport
+
+class FakeYahoo:
+    """Doble de yfinance: histórico diario de un año y `info` por símbolo."""
+
+    def __init__(self, latencia: float = 0.05):
+        self.latencia = latencia
+        self.llamadas = Counter()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.llamadas.clear()
+
+    def _count(self, ruta: str):
+        with self._lock:
+            self.llamadas[ruta] += 1
+
+    def download(self, tickers, **kwargs):
+        import numpy as np
+        import pandas as pd
+
+        self._count("download")
+        time.sleep(self.latencia)
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        dias = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=250)
+        marcos = []
+        for i, s in enumerate(tickers):
+            cierre = 10 + i + np.sin(np.arange(len(dias)) / 10)
+            marcos.append(pd.DataFrame({"Open": cierre, "High": cierre * 1.01, "Low": cierre * 0.99,
+                                        "Close": cierre, "Adj Close": cierre, "Volume": 1_000_000}, index=dias))
+        return pd.concat(marcos, axis=1, keys=tickers)
+
+    def Ticker(self, symbol: str):
+        yahoo = self
+
+        class _Ticker:
+            @property
+            def info(self):
+                yahoo._count("info")
+                time.sleep(yahoo.latencia)
+                return {"symbol": symbol, "shortName": f"Empresa {symbol}", "currency": "EUR",
+                        "exchange": "MCE", "sharesOutstanding": 1_000_000_000}
+        return _Ticker()
+
+class _RssPeak:
+    """Pico de RSS del proceso durante un bloque (muestreo de /proc; si no existe, ru_maxrss)."""
+
+    def __init__(self, intervalo: float = 0.01):
+        self.intervalo = intervalo
+        self.pico = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def rss() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * resource.getpagesize()
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.pico = max(self.pico, self.rss())
+            self._stop.wait(self.intervalo)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.pico = max(self.pico, self.rss())
+
+def _percentil(valores: list, p: float) -> float:
+    """Percentil por rango más cercano."""
+    if not valores: return float("nan")
+    orden = sorted(valores)
+    return orden[max(0, math.ceil(p / 100 * len(orden)) - 1)]
+
+def _vaciar_caches():
+    """Deja el almacén local y las cachés en memoria como en una primera ejecución."""
+    from storage import get_db
+    from tools import market
+
+    db = get_db()
+    for (tabla,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+        db.execute(f"DELETE FROM {tabla}")
+    with market._memoria_lock:
+        market._memoria.clear()
+
+def _configurar(args, tmp: str, google, transporte, noticias, telegram):
+    """Apunta la configuración a los servicios falsos (antes de importar config)."""
+    simbolos = ["REP.MC"] + [f"S{i:02d}.MC" for i in range(1, args.tickers)]
+    busquedas = ["Repsol", "Ibex 35", "Petróleo", "BCE", "Iberdrola"][:max(1, args.busquedas)]
+    os.environ.update({
+        "CACHE_DIR": os.path.join(tmp, "cache"),
+        "GOOGLE_API_ROOT": google.url,
+        "GOOGLE_TOKEN_FILE": os.path.join(tmp, "token.json"),
+        "TRANSPORT_URL": transporte.url + "ultima.asp",
+        "NEWS_URL": noticias.url + "rss/search",
+        "TELEGRAM_API": telegram.url.rstrip("/"),
+        "TELEGRAM_TOKEN": "bench", "TELEGRAM_CHAT_ID": "1",
+        "PUSHOVER_USER": "",
+        "WATCHLIST": ",".join(simbolos), "NEWS_QUERIES": ";".join(busquedas), "TRANSPORT_LINES": "44",
+        "LLM_CACHE": "0", "LLM_REPLAY": "0", "DELIVERY_DEDUPE_TTL": "0",
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from config import SCOPES
+    with open(os.environ["GOOGLE_TOKEN_FILE"], "w") as f:
+        json.dump({"token": "bench", "refresh_token": "bench", "client_id": "bench", "client_secret": "bench",
+                   "scopes": SCOPES, "expiry": "2099-01-01T00:00:00Z"}, f)
+
+def _escenarios(nombres: list, llm) -> list:
+    from collector import build_sources, collect
+    from config import WATCHLIST, NEWS_QUERIES, TRANSPORT_LINES
+
+    escenarios = []
+    if "herramientas" in nombres:
+        from tools.google_suite import read_emails, get_todays_agenda, get_todays_tasks
+        from tools.market import get_stock_price, get_financial_news
+        from tools.messaging import send_telegram
+        from tools.transport import inc_transport
+        escenarios += [
+            ("tool:read_emails", lambda: read_emails.run()),
+            ("tool:get_todays_agenda", lambda: get_todays_agenda.run()),
+            ("tool:get_todays_tasks", lambda: get_todays_tasks.run()),
+            ("tool:get_stock_price", lambda: get_stock_price.run(symbol=",".join(WATCHLIST))),
+            ("tool:get_financial_news", lambda: get_financial_news.run(busqueda=";".join(NEWS_QUERIES))),
+            ("tool:inc_transport", lambda: inc_transport.run(lineas=",".join(TRANSPORT_LINES))),
+            ("tool:send_telegram", lambda: send_telegram.run(message="*Bench*")),
+        ]
+    if "recoleccion" in nombres:
+        escenarios.append(("recoleccion", lambda: collect(build_sources())))
+    if "directo" in nombres:
+        from pipeline import run_pipeline
+        escenarios.append(("directo", lambda: run_pipeline(llm)))
+    if "crew" in nombres:
+        from crew_setup import create_crew
+        escenarios.append(("crew", lambda: create_crew(llm).kickoff()))
+    return escenarios
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo con servicios falsos")
+    parser.add_argument("--correos", type=int, default=10)
+    parser.add_argument("--tickers", type=int, default=1)
+    parser.add_argument("--busquedas", type=int, default=2)
+    parser.add_argument("--eventos", type=int, default=5, help="eventos por calendario")
+    parser.add_argument("--tareas", type=int, default=5, help="tareas por lista")
+    parser.add_argument("--imagenes", type=int, default=1, help="imágenes del parte de transporte")
+    parser.add_argument("--latencia", type=float, default=0.05, help="segundos por petición HTTP")
+    parser.add_argument("--llm-latencia", type=float, default=0.2, help="segundos por llamada al LLM")
+    parser.add_argument("--reps", type=int, default=5)
+    parser.add_argument("--escenarios", default="herramientas,recoleccion,directo,crew")
+    parser.add_argument("--frio", action="store_true", help="vacía las cachés antes de cada repetición")
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        tmp = stack.enter_context(tempfile.TemporaryDirectory(prefix="briefing-bench-"))
+        google = stack.enter_context(FakeGoogle(n_correos=args.correos, n_eventos=args.eventos,
+                                                n_tareas=args.tareas, latencia=args.latencia))
+        transporte = stack.enter_context(FakeTransport(n_imagenes=args.imagenes, latencia=args.latencia))
+        noticias = stack.enter_context(FakeNews(latencia=args.latencia))
+        telegram = stack.enter_context(FakeTelegram(latencia=args.latencia))
+        _configurar(args, tmp, google, transporte, noticias, telegram)
+
+        from bench.fake_llm import ScriptedLLM
+        from tools import market
+        yahoo = FakeYahoo(latencia=args.latencia)
+        market.yf = yahoo
+        llm = ScriptedLLM(latencia=args.llm_latencia)
+        servicios = {"google": google, "transporte": transporte, "noticias": noticias,
+                     "telegram": telegram, "yahoo": yahoo}
+
+        print(f"Volumen: {args.correos} correos, {args.tickers} tickers, {args.busquedas} búsquedas, "
+              f"{args.imagenes} imágenes | latencia HTTP {args.latencia * 1000:.0f} ms, "
+              f"LLM {args.llm_latencia * 1000:.0f} ms | {args.reps} repeticiones\n")
+        print(f"{'escenario':<26}{'frío s':>8}{'p50 s':>8}{'p95 s':>8}{'RSS MB':>8}{'http':>7}{'llm':>5}{'tok in':>8}")
+        detalle = {}
+        for nombre, fn in _escenarios(args.escenarios.split(","), llm):
+            for s in servicios.values(): s.reset()
+            llm.reset()
+            tiempos = []
+            with _RssPeak() as rss:
+                for rep in range(args.reps):
+                    if rep == 0 or args.frio: _vaciar_caches()
+                    t0 = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        fn()
+                    tiempos.append(time.perf_counter() - t0)
+
+            llamadas = Counter()
+            for servicio, s in servicios.items():
+                llamadas.update({f"{servicio}.{ruta}": n for ruta, n in s.llamadas.items()})
+            detalle[nombre] = {k: round(v / args.reps, 1) for k, v in sorted(llamadas.items())}
+            calientes = tiempos if args.frio else tiempos[1:] or tiempos
+            http = sum(s.peticiones for s in (google, transporte, noticias, telegram)) / args.reps
+            print(f"{nombre:<26}{tiempos[0]:>8.2f}{_percentil(calientes, 50):>8.2f}{_percentil(calientes, 95):>8.2f}"
+                  f"{rss.pico / 2**20:>8.0f}{http:>7.1f}{llm.llamadas / args.reps:>5.1f}{llm.tokens_prompt / args.reps:>8.0f}")
+
+        print("\nLlamadas por ejecución (ruta: media):")
+        for nombre, rutas in detalle.items():
+            print(f"  {nombre}: " + (", ".join(f"{r}={n:g}" for r, n in rutas.items()) or "-"))
+        hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        print(f"\nRSS máximo de subprocesos (pool OCR / tesseract): {hijos:.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# bench/fake_llm.py
+"""LLM guionizado para los benchmarks: respuestas deterministas con latencia fija."""
+import threading
+import time
+
+from crewai import BaseLLM
+
+from packing import count_tokens
+
+class ScriptedLLM(BaseLLM):
+    """Responde en formato ReAct de crewai sin red.
+
+    Si el prompt ofrece la herramienta de envío del briefing y el agente aún no ha
+    actuado, pide usarla con un briefing sintético; en otro caso da la respuesta final
+    con una viñeta por cada línea de datos recibida (hasta `max_vinetas`).
+    """
+
+    def __init__(self, latencia: float = 0.2, max_vinetas: int = 5):
+        super().__init__(model="scripted/bench", temperature=0)
+        self.latencia = latencia
+        self.max_vinetas = max_vinetas
+        self.llamadas = 0
+        self.tokens_prompt = 0
+        self.tokens_completion = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.llamadas = self.tokens_prompt = self.tokens_completion = 0
+
+    def _respuesta(self, texto: str, actuado: bool) -> str:
+        if "Enviar briefing" in texto and not actuado:
+            return ('Thought: Envío el briefing.\nAction: Enviar briefing\n'
+                    'Action Input: {"message": "*BRIEFING*\\n• Agenda\\n• Tareas\\n• Correos\\n• Mercado\\n• Transporte"}')
+        lineas = [l.strip() for l in texto.splitlines() if l.strip().startswith(("{", "[", "•", "-"))]
+        vinetas = "\n".join(f"• {l[:80]}" for l in lineas[:self.max_vinetas]) or "• Sin novedades."
+        return f"Thought: Tengo lo necesario.\nFinal Answer: {vinetas}"
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        if isinstance(messages, str): messages = [{"role": "user", "content": messages}]
+        texto = "\n".join(str(m.get("content", "")) for m in messages)
+        # Tras usar una herramienta crewai añade la acción (assistant) y su Observation
+        actuado = any(m.get("role") == "assistant" for m in messages)
+        time.sleep(self.latencia)
+        respuesta = self._respuesta(texto, actuado)
+        with self._lock:
+            self.llamadas += 1
+            self.tokens_prompt += count_tokens(texto)
+            self.tokens_completion += count_tokens(respuesta)
+        return respuesta
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 1_000_000
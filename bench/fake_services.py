@@ -0,0 +1,292 @@
+# bench/fake_services.py
+"""Servicios externos falsos en local (Google APIs, tmpmurcia, Google News, Telegram).
+
+Cada servicio escucha en su propio puerto, añade una latencia fija a cada
+petición HTTP y cuenta peticiones, bytes y llamadas por ruta (las partes de
+un batch cuentan como llamadas, no como peticiones). Los datos se generan de
+forma determinista según el volumen pedido.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import urlparse, parse_qs, unquote
+from xml.sax.saxutils import escape
+from zoneinfo import ZoneInfo
+
+_PART_RE = re.compile(r"Content-ID:\s*<([^>]+)>.*?(GET|POST)\s+(\S+)\s+HTTP/1\.1", re.S | re.I)
+
+class FakeServer:
+    """Servidor HTTP local con latencia fija y contadores por ruta.
+
+    Las subclases implementan `route(metodo, path, params, headers, body)` y
+    devuelven `(estado, content_type, cuerpo, cabeceras)`.
+    """
+
+    def __init__(self, latencia: float = 0.05):
+        self.latencia = latencia
+        self.llamadas = Counter()
+        self.peticiones = 0
+        self.bytes_enviados = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.llamadas.clear()
+            self.peticiones = 0
+            self.bytes_enviados = 0
+
+    def count(self, ruta: str, n: int = 1):
+        with self._lock:
+            self.llamadas[ruta] += n
+
+    def route(self, metodo: str, path: str, params: dict, headers, body: bytes) -> tuple:
+        raise NotImplementedError
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, metodo: str):
+                url = urlparse(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+                try:
+                    estado, ctype, data, extra = fake.route(metodo, unquote(url.path), parse_qs(url.query), self.headers, body)
+                except KeyError:
+                    estado, ctype, data, extra = 404, "application/json", b'{"error": {"code": 404}}', {}
+                time.sleep(fake.latencia)
+                with fake._lock:
+                    fake.peticiones += 1
+                    fake.bytes_enviados += len(data)
+                self.send_response(estado)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in extra.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+        return Handler
+
+def _json(obj, estado: int = 200) -> tuple:
+    return estado, "application/json", json.dumps(obj, ensure_ascii=False).encode(), {}
+
+class FakeGoogle(FakeServer):
+    """Gmail (list, get, batch, history, profile), Calendar (calendarList, events) y Tasks.
+
+    Gmail sirve `n_correos` mensajes de hoy; `history.list` no devuelve
+    cambios, como en un briefing posterior sin correo nuevo. Calendar entrega
+    un `nextSyncToken` y con él responde sin cambios.
+    """
+
+    def __init__(self, n_correos: int = 10, n_calendarios: int = 2, n_eventos: int = 5,
+                 n_listas: int = 2, n_tareas: int = 5, page_size: int = 100, tz: str = "Europe/Madrid", **kwargs):
+        super().__init__(**kwargs)
+        self.n_correos, self.page_size = n_correos, page_size
+        self.n_calendarios, self.n_eventos = n_calendarios, n_eventos
+        self.n_listas, self.n_tareas = n_listas, n_tareas
+        self.tz = ZoneInfo(tz)
+
+    # --- Gmail ---
+
+    def _mensaje(self, msg_id: str, formato: str = 'metadata') -> dict:
+        n = int(msg_id.lstrip('m'))
+        headers = [{"name": "Subject", "value": f"Asunto {n}"}, {"name": "From", "value": f"remitente{n % 7}@example.com"}]
+        # Uno de cada tres es un boletín promocional, para que el pre-triaje tenga algo que descartar
+        etiquetas = ["INBOX", "CATEGORY_PROMOTIONS" if n % 3 == 0 else "CATEGORY_PERSONAL"]
+        if n % 3 == 0: headers.append({"name": "List-Unsubscribe", "value": "<mailto:baja@example.com>"})
+        payload = {"headers": headers}
+        if formato != 'metadata':
+            # Simula el cuerpo completo que descarga format=full
+            headers += [{"name": f"X-Header-{i}", "value": "x" * 60} for i in range(30)]
+            payload["body"] = {"size": 20000, "data": "A" * 20000}
+        return {"id": msg_id, "threadId": f"t{n}", "labelIds": etiquetas, "internalDate": str(1_700_000_000_000 + n * 60_000),
+                "snippet": f"Resumen del mensaje {n} " * 5, "payload": payload}
+
+    def _gmail(self, path: str, params: dict) -> tuple:
+        recurso = path.split('/users/me/', 1)[1]
+        if recurso == 'profile':
+            self.count("gmail.profile")
+            return _json({"historyId": "1000"})
+        if recurso == 'history':
+            self.count("gmail.history")
+            return _json({"historyId": "1000"})
+        if recurso == 'messages':
+            self.count("gmail.list")
+            if 'in:sent' in params.get('q', [''])[0]:
+                return _json({"messages": [{"id": f"s{i}", "threadId": f"t{i}"} for i in range(0, self.n_correos, 5)]})
+            inicio = int(params.get('pageToken', ['0'])[0])
+            fin = min(inicio + min(int(params.get('maxResults', ['100'])[0]), self.page_size), self.n_correos)
+            resp = {"messages": [{"id": f"m{i}", "threadId": f"t{i}"} for i in range(inicio, fin)]}
+            if fin < self.n_correos: resp["nextPageToken"] = str(fin)
+            return _json(resp)
+        self.count("gmail.get")
+        return _json(self._mensaje(recurso.rsplit('/', 1)[-1], params.get('format', ['full'])[0]))
+
+    def _batch(self, body: str) -> tuple:
+        self.count("gmail.batch")
+        boundary = "batch_fake_boundary"
+        partes = []
+        for content_id, metodo, path in _PART_RE.findall(body):
+            url = urlparse(path)
+            _, _, contenido, _ = self._api(metodo, unquote(url.path), parse_qs(url.query))
+            partes.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{contenido.decode()}\r\n"
+            )
+        cuerpo = "".join(partes) + f"--{boundary}--\r\n"
+        return 200, f"multipart/mixed; boundary={boundary}", cuerpo.encode(), {}
+
+    # --- Calendar ---
+
+    def _calendar(self, path: str, params: dict) -> tuple:
+        if path.endswith('/calendarList'):
+            self.count("calendar.calendarList")
+            return _json({"items": [{"id": f"cal{i}", "summary": f"Calendario {i}", "selected": True}
+                                    for i in range(self.n_calendarios)]})
+        self.count("calendar.events")
+        if 'syncToken' in params: return _json({"items": [], "nextSyncToken": params['syncToken'][0]})
+        cal = path.split('/calendars/', 1)[1].split('/', 1)[0]
+        hoy = datetime.now(self.tz).replace(hour=8, minute=0, second=0, microsecond=0)
+        items = []
+        for i in range(self.n_eventos):
+            inicio = hoy + timedelta(minutes=45 * i)
+            items.append({"id": f"{cal}-e{i}", "status": "confirmed", "summary": f"Reunión {i}",
+                          "start": {"dateTime": inicio.isoformat()},
+                          "end": {"dateTime": (inicio + timedelta(minutes=30)).isoformat()}})
+        return _json({"items": items, "nextSyncToken": f"sync-{cal}"})
+
+    # --- Tasks ---
+
+    def _tasks(self, path: str, params: dict) -> tuple:
+        if path.endswith('/users/@me/lists'):
+            self.count("tasks.tasklists")
+            return _json({"items": [{"id": f"l{i}", "title": f"Lista {i}"} for i in range(self.n_listas)]})
+        self.count("tasks.tasks")
+        lista = path.split('/lists/', 1)[1].split('/', 1)[0]
+        due = datetime.now(self.tz).strftime("%Y-%m-%dT00:00:00.000Z")
+        return _json({"items": [{"id": f"{lista}-t{i}", "title": f"Tarea {i}", "due": due, "status": "needsAction"}
+                                for i in range(self.n_tareas)]})
+
+    def _api(self, metodo: str, path: str, params: dict) -> tuple:
+        if path.startswith('/gmail/'): return self._gmail(path, params)
+        if path.startswith('/calendar/'): return self._calendar(path, params)
+        if path.startswith('/tasks/'): return self._tasks(path, params)
+        raise KeyError(path)
+
+    def route(self, metodo, path, params, headers, body):
+        if path.startswith('/batch'): return self._batch(body.decode())
+        return self._api(metodo, path, params)
+
+class FakeTransport(FakeServer):
+    """Portada de tmpmurcia, boletín del día e imágenes del parte, con ETag (responde 304)."""
+
+    LINEAS = ["PARTE DIARIO DE INCIDENCIAS", "Linea 44: desvio por obras en Gran Via",
+              "Linea 1: retrasos de 10 minutos", "Linea 30: servicio normal", "Linea 39: parada 2201 anulada"]
+
+    def __init__(self, n_imagenes: int = 1, **kwargs):
+        super().__init__(**kwargs)
+        self.n_imagenes = n_imagenes
+        self._imagen = None
+        self._modificado = formatdate(usegmt=True)
+
+    def imagen(self) -> bytes:
+        """PNG con el texto del parte (se genera una vez)."""
+        if self._imagen is None:
+            from PIL import Image, ImageDraw
+            img = Image.new('L', (1400, 120 + 60 * len(self.LINEAS)), 255)
+            draw = ImageDraw.Draw(img)
+            for i, linea in enumerate(self.LINEAS):
+                draw.text((60, 60 + 60 * i), linea, fill=0)
+            img = img.resize((img.width * 2, img.height * 2))
+            buf = BytesIO()
+            img.save(buf, format='PNG')
+            self._imagen = buf.getvalue()
+        return self._imagen
+
+    def _condicional(self, ruta: str, headers, ctype: str, data: bytes) -> tuple:
+        etag = '"' + hashlib.sha1(data).hexdigest()[:16] + '"'
+        self.count(ruta)
+        if headers.get('If-None-Match') == etag:
+            self.count(f"{ruta}.304")
+            return 304, ctype, b"", {"ETag": etag}
+        return 200, ctype, data, {"ETag": etag, "Last-Modified": self._modificado}
+
+    def route(self, metodo, path, params, headers, body):
+        relleno = "<p>" + "Noticias del servicio. " * 200 + "</p>"
+        if path == '/ultima.asp':
+            html = f"<html><body>{relleno}<a href=\"Cuerpo.asp?codigo=1234\">Parte diario</a>{relleno}</body></html>"
+            return self._condicional("portada", headers, "text/html; charset=latin-1", html.encode('latin-1'))
+        if path == '/Cuerpo.asp':
+            imgs = "".join(f'<img src="/fotos/noticias/parte{i}.png">' for i in range(self.n_imagenes))
+            html = f"<html><body>{relleno}{imgs}{relleno}</body></html>"
+            return self._condicional("boletin", headers, "text/html; charset=latin-1", html.encode('latin-1'))
+        if path.startswith('/fotos/noticias/'):
+            return self._condicional("imagen", headers, "image/png", self.imagen())
+        raise KeyError(path)
+
+class FakeNews(FakeServer):
+    """RSS de Google News con `n_items` noticias por búsqueda."""
+
+    def __init__(self, n_items: int = 20, **kwargs):
+        super().__init__(**kwargs)
+        self.n_items = n_items
+
+    def route(self, metodo, path, params, headers, body):
+        if not path.endswith('/rss/search'): raise KeyError(path)
+        self.count("rss")
+        q = escape(params.get('q', [''])[0])
+        items = "".join(
+            f"<item><title>{q}: titular {i}</title><link>https://example.com/{i}</link>"
+            f"<description>{'Texto de la noticia. ' * 20}</description></item>"
+            for i in range(self.n_items)
+        )
+        rss = f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>{q}</title>{items}</channel></rss>'
+        return 200, "application/rss+xml", rss.encode(), {}
+
+class FakeTelegram(FakeServer):
+    """`sendMessage` de la Bot API; guarda los mensajes recibidos."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.mensajes = []
+
+    def route(self, metodo, path, params, headers, body):
+        if not path.endswith('/sendMessage'): raise KeyError(path)
+        self.count("sendMessage")
+        with self._lock:
+            self.mensajes.append(json.loads(body or b"{}").get("text", ""))
+        return _json({"ok": True, "result": {"message_id": len(self.mensajes)}})
@@ -0,0 +1,54 @@
+# bench/gmail_bench.py
+"""Compara la lectura de Gmail N+1 secuencial frente a la batch con metadatos.
+
+Uso: python -m bench.gmail_bench [n_mensajes] [latencia_s]
+"""
+import json
+import sys
+import time
+from importlib import resources
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+
+from bench.fake_services import FakeGoogle
+from tools.google_suite import list_message_ids, fetch_metadata
+
+def _service(url: str):
+    """Servicio Gmail real de googleapiclient apuntando al servidor falso."""
+    doc = json.loads(resources.files("googleapiclient.discovery_cache.documents").joinpath("gmail.v1.json").read_text())
+    doc["rootUrl"] = url
+    return build_from_document(doc, http=httplib2.Http())
+
+def legacy(service, query: str) -> list:
+    """Implementación anterior: una página de 20 y un `get` completo por mensaje."""
+    msgs = service.users().messages().list(userId='me', q=query, maxResults=20).execute().get('messages', [])
+    correos = []
+    for m in msgs:
+        txt = service.users().messages().get(userId='me', id=m['id']).execute()
+        headers = txt.get('payload', {}).get('headers', [])
+        subj = next((h['value'] for h in headers if h['name'] == 'Subject'), 'Sin Asunto')
+        correos.append({"asunto": subj, "snippet": txt.get('snippet', '')[:100]})
+    return correos
+
+def batched(service, query: str) -> list:
+    return fetch_metadata(service, list_message_ids(service, query, limite=10_000))[0]
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latencia = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    query = "category:primary"
+
+    with FakeGoogle(n_correos=n, latencia=latencia) as fake:
+        service = _service(fake.url)
+        print(f"Gmail falso: {n} mensajes, {latencia * 1000:.0f} ms por petición HTTP\n")
+        print(f"{'modo':<10}{'mensajes':>10}{'peticiones':>12}{'KB':>10}{'segundos':>10}")
+        for nombre, fn in (("legacy", legacy), ("batch", batched)):
+            fake.reset()
+            t0 = time.perf_counter()
+            correos = fn(service, query)
+            dt = time.perf_counter() - t0
+            print(f"{nombre:<10}{len(correos):>10}{fake.peticiones:>12}{fake.bytes_enviados / 1024:>10.0f}{dt:>10.2f}")
+
+if __name__ == "__main__":
+    main()
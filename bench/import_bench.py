@@ -0,0 +1,67 @@
+# bench/import_bench.py
+"""Tiempo de arranque en frío y memoria base por punto de entrada.
+
+Uso: python -m bench.import_bench [repeticiones]
+
+Cada caso se ejecuta en un proceso nuevo con `-X importtime`; se informa del
+tiempo de import, el RSS máximo, los módulos cargados y los paquetes que más
+tardan. El caso `eager` reproduce los imports que se hacían antes al arrancar.
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+CASOS = {
+    "eager": "import crewai, yfinance, pandas, feedparser, twilio.rest, PIL.Image, pytesseract, "
+             "googleapiclient.discovery, google_auth_oauthlib.flow",
+    "config": "import config",
+    "directo": "import pipeline, collector",
+    "crew": "import crew_setup",
+    "tools": "import tools; tools.send_telegram",
+    "tools+google": "import tools; tools.read_emails",
+    "tools+market": "import tools; tools.get_stock_price",
+    "tools+transporte": "import tools; tools.inc_transport",
+}
+
+_SONDA = ("import time; _t = time.perf_counter()\n{codigo}\n"
+          "import resource, sys; print(time.perf_counter() - _t, "
+          "resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, len(sys.modules))")
+
+_LINEA = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+def _medir(codigo: str) -> tuple:
+    """(segundos, RSS máximo en KB, nº de módulos, cumulativo en µs por paquete de primer nivel)."""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _SONDA.format(codigo=codigo)],
+                          cwd=raiz, capture_output=True, text=True, env={**os.environ, "LOG_LEVEL": "WARNING"})
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    segundos, rss, modulos = proc.stdout.strip().splitlines()[-1].split()
+    paquetes = Counter()
+    for linea in proc.stderr.splitlines():
+        m = _LINEA.match(linea)
+        # Solo las entradas de primer nivel: su cumulativo ya incluye a sus dependencias
+        if m and len(m.group(3)) == 1:
+            paquetes[m.group(4).split('.')[0]] += int(m.group(2))
+    return float(segundos), int(rss), int(modulos), paquetes
+
+def main():
+    reps = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"{'caso':<18}{'import s':>10}{'RSS MB':>8}{'módulos':>9}  más lentos")
+    for nombre, codigo in CASOS.items():
+        try:
+            medidas = [_medir(codigo) for _ in range(reps)]
+        except RuntimeError as e:
+            print(f"{nombre:<18}{'error':>10}  {e}")
+            continue
+        segundos = statistics.median(m[0] for m in medidas)
+        rss = max(m[1] for m in medidas) / 1024
+        top = medidas[-1][3].most_common(4)
+        print(f"{nombre:<18}{segundos:>10.2f}{rss:>8.0f}{medidas[-1][2]:>9}  "
+              + ", ".join(f"{p} {us / 1e6:.2f}s" for p, us in top))
+
+if __name__ == "__main__":
+    main()
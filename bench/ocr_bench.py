@@ -0,0 +1,69 @@
+# bench/ocr_bench.py
+"""Compara el OCR anterior (pytesseract a resolución completa) con tools.ocr.
+
+Uso: python -m bench.ocr_bench <carpeta_con_imagenes>
+
+Cada imagen puede llevar al lado un `.txt` con el texto de referencia
+(mismo nombre); si existe se informa la precisión (similitud de caracteres).
+"""
+import difflib
+import resource
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+import pytesseract
+
+from tools import ocr
+
+EXTENSIONES = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+def legacy(images: list) -> list:
+    """Implementación anterior: imagen completa, un subproceso por imagen y fallback secuencial."""
+    textos = []
+    for data in images:
+        imagen = Image.open(BytesIO(data))
+        try:
+            textos.append(pytesseract.image_to_string(imagen, lang='spa'))
+        except pytesseract.TesseractError:
+            textos.append(pytesseract.image_to_string(imagen, lang='eng'))
+    return textos
+
+def _precision(textos: list, referencias: list) -> str:
+    pares = [(t, r) for t, r in zip(textos, referencias) if r is not None]
+    if not pares: return "n/d"
+    media = sum(difflib.SequenceMatcher(None, " ".join(t.split()), " ".join(r.split())).ratio() for t, r in pares) / len(pares)
+    return f"{media * 100:.1f}%"
+
+def _medir(fn, images: list) -> tuple:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    textos = fn(images)
+    dt = time.perf_counter() - t0
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return textos, dt, pico
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    rutas = sorted(p for p in Path(sys.argv[1]).iterdir() if p.suffix.lower() in EXTENSIONES)
+    images = [p.read_bytes() for p in rutas]
+    referencias = [p.with_suffix('.txt').read_text(encoding='utf-8') if p.with_suffix('.txt').exists() else None for p in rutas]
+
+    print(f"Corpus: {len(images)} imágenes ({sum(map(len, images)) / 1024:.0f} KB), motor: {'tesserocr' if ocr.tesserocr else 'pytesseract'}\n")
+    print(f"{'modo':<10}{'segundos':>10}{'ms/img':>10}{'pico py MB':>12}{'precisión':>12}")
+    for nombre, fn in (("legacy", legacy), ("engine", ocr.ocr_many)):
+        textos, dt, pico = _medir(fn, images)
+        print(f"{nombre:<10}{dt:>10.2f}{dt * 1000 / max(1, len(images)):>10.0f}{pico / 2**20:>12.1f}{_precision(textos, referencias):>12}")
+
+    # ru_maxrss está en KB en Linux
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(f"\nRSS máximo: proceso {propio:.0f} MB, mayor subproceso (tesseract / pool) {hijos:.0f} MB")
+
+if __name__ == "__main__":
+    main()
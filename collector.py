@@ -0,0 +1,65 @@
+# collector.py
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict
+
+from config import COLLECT_WORKERS, SOURCE_TIMEOUT, WATCHLIST, NEWS_QUERIES, TRANSPORT_LINES, DISABLED_SOURCES, logger
+from profiling import propagate
+from users import setting
+import tools
+
+def _to_text(resultado) -> str:
+    """Normaliza la salida de una herramienta a texto."""
+    if isinstance(resultado, str): return resultado
+    return json.dumps(resultado, ensure_ascii=False, default=str)
+
+def build_sources() -> dict:
+    """Fuentes de datos con sus argumentos fijos (del usuario actual o de config), listas para ejecutarse en paralelo.
+
+    Cada herramienta se resuelve en el registro al ejecutarse, así que el
+    módulo de una fuente desactivada nunca se importa.
+    """
+    watchlist, busquedas = setting("watchlist", WATCHLIST), setting("news_queries", NEWS_QUERIES)
+    lineas = setting("transport_lines", TRANSPORT_LINES)
+    sources = {
+        "transporte": lambda: tools.inc_transport.run(lineas=",".join(lineas)),
+        "correo": lambda: tools.read_emails.run(),
+        "agenda": lambda: tools.get_todays_agenda.run(),
+        "tareas": lambda: tools.get_todays_tasks.run(),
+    }
+    if watchlist:
+        sources["bolsa"] = lambda: tools.get_stock_price.run(symbol=",".join(watchlist))
+    if busquedas:
+        sources["noticias"] = lambda: tools.get_financial_news.run(busqueda=";".join(busquedas))
+    return {nombre: fn for nombre, fn in sources.items() if nombre not in DISABLED_SOURCES}
+
+def collect(sources: Dict[str, Callable[[], object]],
+            timeout: float = SOURCE_TIMEOUT,
+            workers: int = COLLECT_WORKERS) -> Dict[str, str]:
+    """Ejecuta todas las fuentes a la vez con un timeout por fuente.
+
+    Las fuentes son independientes, así que la latencia total se acerca a la
+    de la fuente más lenta. Una fuente que falla o se pasa de tiempo devuelve
+    un JSON de error en lugar de bloquear al resto.
+    """
+    resultados = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources))), thread_name_prefix="collect")
+    inicio = time.monotonic()
+    futuros = {nombre: pool.submit(propagate(fn)) for nombre, fn in sources.items()}
+
+    for nombre, futuro in futuros.items():
+        restante = max(0.0, timeout - (time.monotonic() - inicio))
+        try:
+            resultados[nombre] = _to_text(futuro.result(timeout=restante))
+        except FutureTimeout:
+            logger.warning(f"⏱️ Fuente '{nombre}' superó {timeout:.0f}s.")
+            resultados[nombre] = json.dumps({"error": f"Timeout {timeout:.0f}s"})
+        except Exception as e:
+            logger.warning(f"⚠️ Fuente '{nombre}' falló: {e}")
+            resultados[nombre] = json.dumps({"error": str(e)}, ensure_ascii=False)
+
+    # No esperamos a hilos colgados: sus resultados ya se han descartado
+    pool.shutdown(wait=False, cancel_futures=True)
+    logger.info(f"📥 Recolección completada en {time.monotonic() - inicio:.1f}s ({len(sources)} fuentes).")
+    return resultados
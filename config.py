@@ -25,10 +25,130 @@ SCOPES = [
 
 DRY_RUN = os.environ.get("DRY_RUN", "0") == "1"
 
+LLM_MODEL = os.environ.get("LLM_MODEL", "gemini/gemini-flash-latest")
+
 # Datos financieros a extraer
 CLAVES_FINANCIERAS = [
     "symbol", "shortName", "currency", "exchange",
     "currentPrice", "regularMarketPrice", "previousClose",
     "regularMarketChangePercent", "dayLow", "dayHigh",
     "fiftyTwoWeekLow", "fiftyTwoWeekHigh", "marketCap"
-]
\ No newline at end of file
+]
+
+# Recolección concurrente de fuentes
+COLLECT_WORKERS = int(os.environ.get("COLLECT_WORKERS", "8"))
+SOURCE_TIMEOUT = float(os.environ.get("SOURCE_TIMEOUT", "90"))
+
+# Parámetros fijos del analista de mercado
+WATCHLIST = [s.strip().upper() for s in os.environ.get("WATCHLIST", "REP.MC").split(",") if s.strip()]
+NEWS_QUERIES = [q.strip() for q in os.environ.get("NEWS_QUERIES", "Repsol").split(";") if q.strip()]
+TRANSPORT_LINES = [l.strip() for l in os.environ.get("TRANSPORT_LINES", "44").split(",") if l.strip()]
+TRANSPORT_MAX_INCIDENTS = int(os.environ.get("TRANSPORT_MAX_INCIDENTS", "10"))  # sin líneas vigiladas
+
+# Fuentes desactivadas (transporte, correo, agenda, tareas, bolsa, noticias): ni se importan sus módulos
+DISABLED_SOURCES = {s.strip() for s in os.environ.get("DISABLED_SOURCES", "").split(",") if s.strip()}
+
+# Modo de ejecución: "crew" (agentes recolectores + briefing) o "directo" (funciones + 1 llamada LLM)
+PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "crew")
+
+# Gmail
+EMAIL_MAX = int(os.environ.get("EMAIL_MAX", "200"))
+GMAIL_BATCH_SIZE = 50  # Límite recomendado por Google por petición batch
+SQL_CHUNK = 500  # Parámetros por consulta `IN (...)` (SQLite admite 999 en versiones antiguas)
+
+# Pre-triaje local del correo: solo los EMAIL_TOP_K mejor puntuados llegan al LLM
+EMAIL_TOP_K = int(os.environ.get("EMAIL_TOP_K", "10"))
+EMAIL_MIN_SCORE = int(os.environ.get("EMAIL_MIN_SCORE", "-30"))  # por debajo no se reenvían
+EMAIL_ALLOW = [s.strip().lower() for s in os.environ.get("EMAIL_ALLOW", "").split(",") if s.strip()]  # direcciones o dominios
+EMAIL_BLOCK = [s.strip().lower() for s in os.environ.get("EMAIL_BLOCK", "").split(",") if s.strip()]
+EMAIL_KEYWORDS = [k.strip() for k in os.environ.get(
+    "EMAIL_KEYWORDS", "urgente,importante,factura,pago,vencimiento,plazo,contrato,reunión,hoy,mañana,incidencia,firma"
+).split(",") if k.strip()]
+EMAIL_WEIGHTS = {
+    "permitido": 100, "conversacion": 40, "palabra_asunto": 15, "palabra": 5, "masivo": -40,
+}
+EMAIL_LABEL_WEIGHTS = {
+    "IMPORTANT": 30, "STARRED": 20, "CATEGORY_PERSONAL": 10, "CATEGORY_UPDATES": -20,
+    "CATEGORY_FORUMS": -20, "CATEGORY_SOCIAL": -40, "CATEGORY_PROMOTIONS": -60,
+}
+
+# Credenciales Google
+TOKEN_FILE = os.environ.get("GOOGLE_TOKEN_FILE", "token.json")
+CREDENTIALS_FILE = os.environ.get("GOOGLE_CREDENTIALS_FILE", "credentials.json")
+TOKEN_REFRESH_MARGIN = int(os.environ.get("TOKEN_REFRESH_MARGIN", "300"))  # segundos antes de expirar
+
+# Almacén local (SQLite) para sincronización incremental y cachés
+CACHE_DIR = os.environ.get("CACHE_DIR", ".cache")
+CACHE_DB = os.path.join(CACHE_DIR, "briefing.db")
+EMAIL_ONLY_NEW = os.environ.get("EMAIL_ONLY_NEW", "1") == "1"
+
+# Zona horaria local del usuario (límites del día, horarios)
+TIMEZONE = os.environ.get("BRIEFING_TZ", "Europe/Madrid")
+
+# Google Calendar / Tasks
+GOOGLE_WORKERS = int(os.environ.get("GOOGLE_WORKERS", "8"))
+CALENDAR_IDS = [c.strip() for c in os.environ.get("CALENDAR_IDS", "").split(",") if c.strip()]
+CALENDAR_SYNC_DAYS = int(os.environ.get("CALENDAR_SYNC_DAYS", "30"))  # ventana de la carga completa
+TASKS_SYNC = os.environ.get("TASKS_SYNC", "0") == "1"  # Caché local con updatedMin
+
+# OCR
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+OCR_MAX_SIDE = int(os.environ.get("OCR_MAX_SIDE", "2000"))  # px; imágenes mayores se reducen al decodificar
+OCR_LANGS = os.environ.get("OCR_LANGS", "spa,eng").split(",")
+
+# Cotizaciones
+QUOTE_TTL = int(os.environ.get("QUOTE_TTL", "300"))  # segundos con el mercado abierto
+QUOTE_META_TTL = 7 * 24 * 3600  # nombre, divisa, bolsa y acciones en circulación
+
+# Noticias
+NEWS_LIMIT = 5
+
+# Cliente HTTP compartido
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "15"))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", "0.5"))  # segundos, base del backoff exponencial
+HTTP_HOST_LIMIT = int(os.environ.get("HTTP_HOST_LIMIT", "6"))  # peticiones simultáneas por host
+HTTP2 = os.environ.get("HTTP2", "1") == "1"  # si httpx[http2] está instalado
+ASYNC_CONCURRENCY = int(os.environ.get("ASYNC_CONCURRENCY", "64"))  # peticiones asíncronas en vuelo (tools/aio.py)
+
+# Entrega del briefing
+DELIVERY_RETRIES = int(os.environ.get("DELIVERY_RETRIES", "3"))
+DELIVERY_DEDUPE_TTL = int(os.environ.get("DELIVERY_DEDUPE_TTL", str(24 * 3600)))  # segundos; 0 desactiva
+
+# Presupuesto de tokens por sección del contexto que recibe el LLM
+CONTEXT_BUDGETS = {
+    "agenda": 400, "tareas": 300, "correo": 800,
+    "bolsa": 250, "noticias": 300, "transporte": 400,
+}
+CONTEXT_DEFAULT_BUDGET = 300
+
+# Caché de respuestas del LLM
+LLM_CACHE = os.environ.get("LLM_CACHE", "1") == "1"
+LLM_REPLAY = os.environ.get("LLM_REPLAY", "0") == "1"  # solo respuestas grabadas, sin red
+LLM_CACHE_MAX_MB = float(os.environ.get("LLM_CACHE_MAX_MB", "50"))
+
+# Briefings incrementales: cada ejecución guarda sus datos y la siguiente del día solo recibe lo nuevo
+DELTA_BRIEFINGS = os.environ.get("DELTA_BRIEFINGS", "1") == "1"
+SNAPSHOT_DAYS = int(os.environ.get("SNAPSHOT_DAYS", "7"))  # días de instantáneas que se conservan
+
+# Endpoints externos (sobrescribibles para apuntar a servicios locales, p. ej. en bench/)
+GOOGLE_API_ROOT = os.environ.get("GOOGLE_API_ROOT")  # sustituye el rootUrl de las APIs de Google
+TRANSPORT_URL = os.environ.get("TRANSPORT_URL", "https://tmpmurcia.es/ultima.asp")
+NEWS_URL = os.environ.get("NEWS_URL", "https://news.google.com/rss/search")
+TELEGRAM_API = os.environ.get("TELEGRAM_API", "https://api.telegram.org")
+
+# Modo residente (main.py --daemon): horas locales de los briefings y precarga previa
+BRIEFING_TIMES = [t.strip() for t in os.environ.get("BRIEFING_TIMES", "06:00,14:00,22:00").split(",") if t.strip()]
+PREFETCH_MINUTES = float(os.environ.get("PREFETCH_MINUTES", "3"))
+PREFETCH_SOURCES = {s.strip() for s in os.environ.get("PREFETCH_SOURCES", "transporte,bolsa,noticias").split(",") if s.strip()}
+TRIGGER_HOST = os.environ.get("TRIGGER_HOST", "127.0.0.1")
+TRIGGER_PORT = int(os.environ.get("TRIGGER_PORT", "8787"))  # 0 desactiva el disparador HTTP
+TRIGGER_TOKEN = os.environ.get("TRIGGER_TOKEN")  # si se define, se exige "Authorization: Bearer <token>"
+
+# Modo multiusuario (main.py --batch)
+USERS_FILE = os.environ.get("USERS_FILE", "users.json")
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "4"))  # usuarios procesados a la vez
+
+# Perfiles de ejecución
+PROFILE_DIR = os.path.join(CACHE_DIR, "profiles")
+PROM_TEXTFILE = os.environ.get("PROM_TEXTFILE", os.path.join(CACHE_DIR, "briefing.prom"))
@@ -2,83 +2,113 @@
 from datetime import datetime
 from crewai import Crew, Agent, Task
 from auth import get_llm
+from collector import build_sources, collect
+from packing import pack
+from profiling import profiler
+from renderer import SECCION, unchanged_sections
+from config import WATCHLIST
+from users import setting
 
-# Importar herramientas desde el paquete
-from tools.google_suite import read_emails, get_todays_agenda, get_todays_tasks
-from tools.market import get_stock_price, get_financial_news
-from tools.transport import inc_transport
-from tools.messaging import send_telegram, send_pushover
+# Importar herramientas desde el registro (cada módulo se carga al usarse)
+from tools import send_briefing
 
-def create_crew():
-    llm = get_llm()
+def _datos(datos: dict, prefijo: str) -> str:
+    """Concatena los resultados cuyo nombre empieza por `prefijo`."""
+    return "\n".join(f"[{k}] {v}" for k, v in datos.items() if k.split(':')[0] == prefijo)
+
+def create_crew(llm=None, datos: dict = None, sin_cambios=(), desde: str = None):
+    llm = llm or get_llm()
     fecha = datetime.now().strftime('%d/%m/%Y')
 
-    # Agentes
+    # Fase de recolección: todas las fuentes a la vez, antes de que razone ningún agente
+    if datos is None:
+        with profiler.span("collect"):
+            datos = collect(build_sources())
+    datos, _ = pack(datos)
+
+    # Agentes (sin herramientas de lectura: analizan los datos ya recopilados)
     transport_agent = Agent(
         role="Analista Transporte",
         goal="Detectar incidencias en transporte hoy.",
-        backstory="Experto en logística urbana. Usas OCR para leer boletines.",
-        llm=llm, tools=[inc_transport], verbose=False
+        backstory="Experto en logística urbana. Lees boletines obtenidos por OCR.",
+        llm=llm, verbose=False
     )
-    
+
     mail_agent = Agent(
         role="Analista Correo",
         goal="Filtrar correo urgente.",
         backstory="EA senior. Solo reportas lo vital.",
-        llm=llm, tools=[read_emails], verbose=False
+        llm=llm, verbose=False
     )
 
     calendar_agent = Agent(
         role="Auditor Agenda",
         goal="Listar eventos exactos.",
         backstory="Bot estricto. No inventas reuniones.",
-        llm=llm, tools=[get_todays_agenda], verbose=False
+        llm=llm, verbose=False
     )
 
     task_agent = Agent(
         role="Gestor Tareas",
         goal="Listar tareas vencidas.",
         backstory="Revisas Google Tasks.",
-        llm=llm, tools=[get_todays_tasks], verbose=False
+        llm=llm, verbose=False
     )
 
     analyst_agent = Agent(
         role="Analista Mercado",
         goal="Info bursátil clave.",
         backstory="Analista de datos financieros.",
-        llm=llm, tools=[get_stock_price, get_financial_news], verbose=False
+        llm=llm, verbose=False
     )
 
     briefing_agent = Agent(
         role="Jefe de Gabinete",
         goal="Generar y enviar reporte.",
         backstory="Consolidas info y envías el resumen final.",
-        llm=llm, tools=[send_telegram, send_pushover], verbose=True
+        llm=llm, tools=[send_briefing.crewai()], verbose=True
     )
 
-    # Tareas
-    t_trans = Task(description="Busca incidencias transporte hoy.", expected_output="Alertas transporte.", agent=transport_agent)
-    t_mail = Task(description=f"Correos importantes de hoy {fecha}.", expected_output="Resumen correos.", agent=mail_agent)
-    t_cal = Task(description=f"Agenda real de hoy {fecha}.", expected_output="Lista eventos.", agent=calendar_agent)
-    t_task = Task(description=f"Tareas para hoy {fecha}.", expected_output="Lista tareas.", agent=task_agent)
-    t_fin = Task(description="Precio REP.MC y noticias relevantes.", expected_output="Datos financieros.", agent=analyst_agent)
+    # Tareas (asíncronas: el briefing espera a todas vía context); las fuentes desactivadas no tienen tarea
+    recolectoras = []
+    if "transporte" in datos:
+        recolectoras.append(Task(description=f"Busca incidencias transporte hoy.\nDatos:\n{datos['transporte']}", expected_output="Alertas transporte en viñetas breves, sin prosa.", agent=transport_agent, async_execution=True, callback=profiler.task_done("task:transporte")))
+    if "correo" in datos:
+        recolectoras.append(Task(description=f"Correos importantes de hoy {fecha}.\nDatos:\n{datos['correo']}", expected_output="Correos urgentes en viñetas breves, sin prosa.", agent=mail_agent, async_execution=True, callback=profiler.task_done("task:correo")))
+    if "agenda" in datos:
+        recolectoras.append(Task(description=f"Agenda real de hoy {fecha}.\nDatos:\n{datos['agenda']}", expected_output="Eventos en viñetas (hora y título), sin prosa.", agent=calendar_agent, async_execution=True, callback=profiler.task_done("task:agenda")))
+    if "tareas" in datos:
+        recolectoras.append(Task(description=f"Tareas para hoy {fecha}.\nDatos:\n{datos['tareas']}", expected_output="Tareas en viñetas, sin prosa.", agent=task_agent, async_execution=True, callback=profiler.task_done("task:tareas")))
+    if "bolsa" in datos or "noticias" in datos:
+        recolectoras.append(Task(
+            description=f"Precio {', '.join(setting('watchlist', WATCHLIST))} y noticias relevantes.\nDatos:\n{_datos(datos, 'bolsa')}\n{_datos(datos, 'noticias')}",
+            expected_output="Cifras clave y titulares en viñetas, sin prosa.", agent=analyst_agent, async_execution=True,
+            callback=profiler.task_done("task:mercado")
+        ))
+
+    # Briefing incremental: las secciones sin cambios no se repiten
+    omitidas = unchanged_sections(sin_cambios, {SECCION.get(k.split(':')[0]) for k in datos})
+    nota = (f"Sin cambios desde las {desde}: {', '.join(omitidas)}. No repitas esas secciones; "
+            f"añade al final una línea que lo indique.\n        ") if omitidas else ""
 
     t_briefing = Task(
         description=f"""Genera BRIEFING {fecha}.
-        Estructura: 
+        Estructura:
         1. 📅 Agenda
         2. ✅ Tareas
         3. 📧 Correos
         4. 📈 Mercado
         5. 🚚 Transporte
-        NO inventes datos. Envía por Telegram.""",
+        {nota}NO inventes datos. Envíalo con la herramienta de envío del briefing.""",
         expected_output="Reporte enviado.",
         agent=briefing_agent,
-        context=[t_trans, t_mail, t_cal, t_task, t_fin]
+        context=recolectoras,
+        callback=profiler.task_done("task:briefing", asincrona=False)
     )
 
+    profiler.start_crew()
     return Crew(
         agents=[transport_agent, mail_agent, calendar_agent, task_agent, analyst_agent, briefing_agent],
-        tasks=[t_trans, t_mail, t_cal, t_task, t_fin, t_briefing],
+        tasks=[*recolectoras, t_briefing],
         verbose=True
-    )
\ No newline at end of file
+    )
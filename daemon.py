@@ -0,0 +1,227 @@
+# daemon.py
+import contextlib
+import json
+import queue
+import signal
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from zoneinfo import ZoneInfo
+
+from collector import build_sources, collect
+from config import (BRIEFING_TIMES, PREFETCH_MINUTES, PREFETCH_SOURCES, TRIGGER_HOST, TRIGGER_PORT,
+                    TRIGGER_TOKEN, TIMEZONE, logger)
+from profiling import profiler
+
+MODOS = ("crew", "directo")
+RETRASO_MAX = 30 * 60  # segundos: un turno perdido (p. ej. equipo suspendido) más viejo se salta
+
+# Módulo de herramientas de cada fuente de collector.build_sources
+MODULOS = {
+    "correo": "tools.google_suite", "agenda": "tools.google_suite", "tareas": "tools.google_suite",
+    "bolsa": "tools.market", "noticias": "tools.market", "transporte": "tools.transport",
+}
+GOOGLE_APIS = {"correo": ("gmail", "v1"), "agenda": ("calendar", "v3"), "tareas": ("tasks", "v1")}
+
+def next_slot(horas: list, ahora: datetime = None) -> datetime:
+    """Próximo turno en hora local.
+
+    Las horas se combinan con la fecha en la zona de TIMEZONE, así que siguen
+    siendo las mismas horas de reloj con horario de verano o de invierno. Una
+    hora inexistente por el cambio de hora (02:30 en marzo) cae una hora después;
+    una hora repetida (02:30 en octubre) se ejecuta en la primera pasada.
+    """
+    tz = ZoneInfo(TIMEZONE)
+    ahora = ahora or datetime.now(tz)
+    hoy = ahora.astimezone(tz).date()
+    for dias in range(2):
+        for h in sorted(horas):
+            slot = datetime.combine(hoy + timedelta(days=dias), h, tzinfo=tz)
+            if slot > ahora: return slot
+    raise ValueError("BRIEFING_TIMES está vacío")
+
+class Daemon:
+    """Proceso residente: briefings programados, precarga antes de cada turno y disparador HTTP local.
+
+    Las dependencias, las credenciales OAuth, los clientes de Google y las
+    conexiones HTTP se quedan calientes entre ejecuciones. Las ejecuciones se
+    serializan en una cola: un disparo manual durante un briefing espera su turno.
+    """
+
+    def __init__(self, mode: str, horas: list = None, prefetch_minutes: float = PREFETCH_MINUTES,
+                 batch: bool = False):
+        self.mode = mode
+        self.batch = batch
+        self.horas = horas or [dtime.fromisoformat(h) for h in BRIEFING_TIMES]
+        self.prefetch = timedelta(minutes=prefetch_minutes)
+        self.ultimo = None
+        self.ejecutando = False
+        self.slot = None
+        self._cola = queue.Queue()
+        self._precargado = None
+        self._perfil_abierto = False
+        self._server = None
+
+    # --- Arranque ---
+
+    def warm(self):
+        """Importa y autentica todo lo que usará el primer briefing."""
+        import tools
+
+        t0 = time.perf_counter()
+        activas = set(build_sources())
+        for modulo in {MODULOS[f] for f in activas} | {"tools.messaging"}:
+            tools.load(modulo)
+        if activas & set(GOOGLE_APIS):
+            from auth import authenticate_google, get_service
+            from users import load_users, use
+            # En modo lote, las credenciales y los clientes de cada usuario
+            for usuario in load_users() if self.batch else [None]:
+                with use(usuario) if usuario else contextlib.nullcontext():
+                    if authenticate_google():
+                        for fuente in activas & set(GOOGLE_APIS):
+                            get_service(*GOOGLE_APIS[fuente])
+        if self.mode == "crew":
+            import crew_setup  # noqa: F401  (crewai)
+        logger.info(f"🔥 Daemon listo en {time.perf_counter() - t0:.1f}s.")
+
+    # --- Ejecuciones ---
+
+    def _prefetch(self):
+        """Adelanta las fuentes lentas; el briefing las encontrará en caché (OCR, cotizaciones, ETag)."""
+        if self.batch:
+            from batch import shared_user
+            from users import load_users, use
+            with use(shared_user(load_users())):
+                fuentes = {k: fn for k, fn in build_sources().items() if k in PREFETCH_SOURCES}
+        else:
+            fuentes = {k: fn for k, fn in build_sources().items() if k in PREFETCH_SOURCES}
+        if not fuentes: return
+        profiler.reset()
+        self._perfil_abierto = True
+        logger.info(f"⏩ Precarga de {', '.join(fuentes)} para el turno de las {self.slot:%H:%M}.")
+        with profiler.span("prefetch"):
+            collect(fuentes)
+
+    def _run(self, origen: str, mode: str):
+        from pipeline import run_briefing
+
+        if not self._perfil_abierto: profiler.reset()
+        self.ejecutando = True
+        t0 = time.time()
+        self.ultimo = {"origen": origen, "modo": mode, "inicio": datetime.now().isoformat(timespec="seconds")}
+        logger.info(f"🚀 Briefing {origen} (modo {mode})...")
+        try:
+            if self.batch:
+                from batch import run_batch
+                self.ultimo["usuarios"] = run_batch(mode)
+            else:
+                run_briefing(mode)
+            self.ultimo["estado"] = "ok"
+            logger.info("✅ Ejecución completada.")
+        except Exception as e:
+            self.ultimo["estado"] = f"error: {e}"
+            logger.error(f"🔥 Briefing fallido: {e}")
+        finally:
+            self.ultimo["segundos"] = round(time.time() - t0, 1)
+            self.ejecutando = False
+            self._perfil_abierto = False
+            profiler.export()
+
+    def trigger(self, mode: str = None) -> int:
+        """Encola un briefing inmediato; devuelve cuántos hay pendientes."""
+        self._cola.put(("manual", mode or self.mode))
+        return self._cola.qsize()
+
+    def stop(self, *_):
+        self._cola.put(None)
+
+    def status(self) -> dict:
+        return {"modo": self.mode, "lote": self.batch, "proximo": self.slot.isoformat() if self.slot else None,
+                "ejecutando": self.ejecutando, "pendientes": self._cola.qsize(), "ultimo": self.ultimo}
+
+    # --- Bucle ---
+
+    def serve(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        self._start_trigger()
+        try:
+            self.warm()
+        except Exception as e:
+            logger.warning(f"⚠️ Precalentamiento incompleto ({e}); se reintentará en el primer briefing.")
+        self.slot = next_slot(self.horas)
+        logger.info(f"⏰ Turnos: {', '.join(h.strftime('%H:%M') for h in sorted(self.horas))} ({TIMEZONE}). Próximo: {self.slot:%d/%m %H:%M}.")
+        try:
+            while True:
+                ahora = time.time()
+                inicio_prefetch = (self.slot - self.prefetch).timestamp()
+                if self.prefetch and self._precargado != self.slot and ahora >= inicio_prefetch:
+                    self._precargado = self.slot
+                    self._prefetch()
+                    continue
+                if ahora >= self.slot.timestamp():
+                    if ahora - self.slot.timestamp() > RETRASO_MAX:
+                        logger.warning(f"⚠️ Turno de las {self.slot:%H:%M} perdido; se salta.")
+                    else:
+                        self._run("programado", self.mode)
+                    self.slot = next_slot(self.horas)
+                    continue
+
+                objetivo = self.slot.timestamp() if self._precargado == self.slot or not self.prefetch else inicio_prefetch
+                # Espera acotada: se reevalúa tras cambios de reloj o suspensiones
+                try:
+                    orden = self._cola.get(timeout=min(60.0, max(0.0, objetivo - ahora)))
+                except queue.Empty:
+                    continue
+                if orden is None: break
+                self._run(*orden)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self._server: self._server.shutdown()
+            logger.info("👋 Daemon detenido.")
+
+    # --- Disparador HTTP ---
+
+    def _start_trigger(self):
+        if not TRIGGER_PORT: return
+        self._server = ThreadingHTTPServer((TRIGGER_HOST, TRIGGER_PORT), _handler(self))
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="trigger").start()
+        logger.info(f"🛎️ Disparador en http://{TRIGGER_HOST}:{TRIGGER_PORT} (POST /run, GET /status).")
+
+def _handler(daemon: Daemon):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _json(self, estado: int, cuerpo: dict):
+            data = json.dumps(cuerpo, ensure_ascii=False).encode()
+            self.send_response(estado)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _autorizado(self) -> bool:
+            return not TRIGGER_TOKEN or self.headers.get("Authorization") == f"Bearer {TRIGGER_TOKEN}"
+
+        def do_GET(self):
+            if not self._autorizado(): return self._json(401, {"error": "no autorizado"})
+            if urlparse(self.path).path != "/status": return self._json(404, {"error": "ruta desconocida"})
+            self._json(200, daemon.status())
+
+        def do_POST(self):
+            if not self._autorizado(): return self._json(401, {"error": "no autorizado"})
+            url = urlparse(self.path)
+            if url.path != "/run": return self._json(404, {"error": "ruta desconocida"})
+            mode = parse_qs(url.query).get("mode", [daemon.mode])[0]
+            if mode not in MODOS: return self._json(400, {"error": f"modo desconocido: {mode}"})
+            self._json(202, {"estado": "en cola", "modo": mode, "pendientes": daemon.trigger(mode)})
+
+    return Handler
+
+def serve(mode: str, batch: bool = False):
+    """Arranca el daemon en primer plano hasta SIGTERM o Ctrl+C."""
+    Daemon(mode, batch=batch).serve()
@@ -0,0 +1,66 @@
+# llm_cache.py
+import hashlib
+import json
+import time
+
+from config import LLM_CACHE_MAX_MB, LLM_REPLAY, logger
+from storage import get_db, transaction
+
+def _db():
+    db = get_db()
+    db.execute("""CREATE TABLE IF NOT EXISTS llm_cache (
+        clave TEXT PRIMARY KEY, respuesta TEXT, bytes INTEGER, usado REAL)""")
+    return db
+
+def cache_key(model: str, temperature, messages, tools=None) -> str:
+    """Clave por contenido: modelo, temperatura, prompt completo y esquema de herramientas."""
+    contenido = json.dumps([model, temperature, messages, tools], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(contenido.encode()).hexdigest()
+
+def lookup(clave: str):
+    db = _db()
+    row = db.execute("SELECT respuesta FROM llm_cache WHERE clave = ?", (clave,)).fetchone()
+    if row: db.execute("UPDATE llm_cache SET usado = ? WHERE clave = ?", (time.time(), clave))
+    return row[0] if row else None
+
+def store(clave: str, respuesta: str):
+    """Guarda una respuesta y expulsa las menos usadas si se supera LLM_CACHE_MAX_MB."""
+    limite = int(LLM_CACHE_MAX_MB * 2**20)
+    with transaction() as db:
+        db.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                   (clave, respuesta, len(respuesta.encode()), time.time()))
+        total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM llm_cache").fetchone()[0]
+        if total > limite:
+            for clave_vieja, tam in db.execute("SELECT clave, bytes FROM llm_cache ORDER BY usado").fetchall():
+                if total <= limite: break
+                db.execute("DELETE FROM llm_cache WHERE clave = ?", (clave_vieja,))
+                total -= tam
+
+def wrap(llm):
+    """Envuelve `llm.call` con la caché. Con LLM_REPLAY un fallo de caché es un error.
+
+    No se cachean llamadas con `available_functions`: ahí el propio LLM ejecuta
+    herramientas (p. ej. enviar el Telegram) y servir la respuesta grabada
+    se saltaría ese efecto.
+    """
+    original = llm.call
+
+    def call(messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        if available_functions:
+            return original(messages, tools, callbacks, available_functions, **kwargs)
+
+        clave = cache_key(llm.model, getattr(llm, 'temperature', None), messages, tools)
+        respuesta = lookup(clave)
+        if respuesta is not None:
+            logger.debug(f"🧠 Respuesta LLM desde caché ({clave[:10]}).")
+            return respuesta
+        if LLM_REPLAY:
+            raise RuntimeError(f"Modo replay: no hay respuesta grabada para este prompt ({clave[:10]}).")
+
+        respuesta = original(messages, tools, callbacks, available_functions, **kwargs)
+        if isinstance(respuesta, str): store(clave, respuesta)
+        return respuesta
+
+    # LLM es un modelo pydantic: se sustituye el método en la instancia sin pasar por la validación
+    object.__setattr__(llm, 'call', call)
+    return llm
@@ -1,16 +1,51 @@
 # main.py
 import sys
-from crew_setup import create_crew
-from config import logger
+import argparse
+from config import PIPELINE_MODE, logger
 
 if __name__ == "__main__":
-    logger.info("🚀 Iniciando Sistema Modular de Agentes...")
+    parser = argparse.ArgumentParser(description="AI Briefing")
+    parser.add_argument("--mode", choices=["crew", "directo"], default=PIPELINE_MODE,
+                        help="crew: agentes recolectores + briefing; directo: funciones + 1 llamada LLM")
+    parser.add_argument("--profile", action="store_true",
+                        help="muestra al final las etapas más lentas (el perfil se guarda siempre)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="proceso residente: briefings a las BRIEFING_TIMES (hora local) y disparador HTTP local")
+    parser.add_argument("--batch", action="store_true",
+                        help="un briefing por cada usuario de USERS_FILE, con las fuentes comunes consultadas una vez")
+    parser.add_argument("--login", metavar="USUARIO",
+                        help="autoriza Google para un usuario de USERS_FILE y guarda su token")
+    args = parser.parse_args()
+
+    if args.login:
+        from auth import login
+        from users import load_users
+        usuario = next((u for u in load_users() if u["id"] == args.login), None)
+        if not usuario: sys.exit(f"Usuario desconocido: {args.login}")
+        sys.exit(0 if login(usuario) else 1)
+
+    import profiling
+    profiling.install()
+
+    if args.daemon:
+        from daemon import serve
+        serve(args.mode, batch=args.batch)
+        sys.exit(0)
+
+    logger.info(f"🚀 Iniciando Sistema Modular de Agentes (modo {args.mode})...")
     try:
-        crew = create_crew()
-        result = crew.kickoff()
+        if args.batch:
+            from batch import run_batch
+            result = "\n".join(f"{uid}: {estado}" for uid, estado in run_batch(args.mode).items())
+        else:
+            from pipeline import run_briefing
+            result = run_briefing(args.mode)
         logger.info("✅ Ejecución completada.")
         print("\n--- RESULTADO FINAL ---\n")
         print(result)
     except Exception as e:
         logger.critical(f"🔥 Fallo crítico: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+    finally:
+        profiling.profiler.export()
+        if args.profile: print("\n--- PERFIL ---\n\n" + profiling.profiler.report())
@@ -10,11 +10,9 @@ from datetime import datetime, timedelta
 from io import BytesIO
 from typing import Optional
 
-# Librerías externas
+# Librerías externas (yfinance, feedparser, twilio, bs4, Pillow y pytesseract
+# se importan dentro de la herramienta que los usa: arrancar es más rápido)
 import requests
-import feedparser
-import yfinance as yf
-import pandas as pd
 from dotenv import load_dotenv
 
 # Google APIs
@@ -27,13 +25,6 @@ from googleapiclient.discovery import build
 from crewai import Crew, Agent, Task, LLM
 from crewai.tools import tool
 
-# Twilio
-from twilio.rest import Client
-
-# Procesamiento de HTML y OCR
-from bs4 import BeautifulSoup
-from PIL import Image
-import pytesseract
 from urllib.parse import urlparse
 
 # ==========================
@@ -149,6 +140,7 @@ def get_financial_news(busqueda: str) -> str:
     headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
 
     try:
+        import feedparser
         response = requests.get(base_url, params=params, headers=headers, timeout=10)
         f = feedparser.parse(response.content)
         noticias_procesadas = []
@@ -171,6 +163,7 @@ def get_financial_news(busqueda: str) -> str:
 def get_stock_price(symbol: str) -> str:
     """Obtiene datos financieros filtrados de Yahoo Finance."""
     try:
+        import yfinance as yf
         t = yf.Ticker(symbol.strip().upper())
         info = t.info
         if not info or ('currentPrice' not in info and 'regularMarketPrice' not in info):
@@ -214,6 +207,7 @@ def send_whatsapp(message: str) -> str:
         return json.dumps({"error": "Configuración incompleta de Twilio"})
 
     try:
+        from twilio.rest import Client
         client = Client(sid, token)
         msg = client.messages.create(
             body=message[:1500],
@@ -317,6 +311,10 @@ def get_todays_tasks() -> str:
 def inc_transport():
     """Obtiene problemas en el transporte mediante OCR."""
     URL = 'https://tmpmurcia.es/ultima.asp'
+    from bs4 import BeautifulSoup
+    from PIL import Image
+    import pytesseract
+
     try:
         parsed = urlparse(URL)
         dominio = f"{parsed.scheme}://{parsed.netloc}/"
@@ -0,0 +1,117 @@
+# packing.py
+import json
+import re
+from typing import Dict
+
+from config import CONTEXT_BUDGETS, CONTEXT_DEFAULT_BUDGET, LLM_MODEL, logger
+from renderer import split_omitted
+from users import current_user
+
+_token_counter = None
+
+def _counter():
+    """Tokenizador de litellm, importado en el primer uso (litellm tarda en cargar)."""
+    global _token_counter
+    if _token_counter is None:
+        try:
+            from litellm import token_counter
+        except ImportError:
+            token_counter = False
+        _token_counter = token_counter
+    return _token_counter
+
+def count_tokens(texto: str) -> int:
+    """Tokens del texto para el modelo de get_llm (aprox. 4 caracteres/token si no hay tokenizador)."""
+    token_counter = _counter()
+    if token_counter:
+        try:
+            return token_counter(model=LLM_MODEL, text=texto)
+        except Exception:
+            pass
+    return max(1, len(texto) // 4)
+
+def compact(obj) -> str:
+    """JSON sin espacios ni campos vacíos."""
+    return json.dumps(_strip(obj), ensure_ascii=False, separators=(',', ':'), default=str)
+
+def _strip(obj):
+    if isinstance(obj, dict):
+        return {k: _strip(v) for k, v in obj.items() if v not in (None, "", [], {})}
+    if isinstance(obj, list):
+        return [_strip(v) for v in obj]
+    if isinstance(obj, str):
+        return re.sub(r'\s+', ' ', obj).strip()
+    return obj
+
+def _atom(obj) -> bool:
+    """Elemento que se envía entero o no se envía: escalar o dict sin listas ni dicts dentro."""
+    if isinstance(obj, list): return False
+    return not isinstance(obj, dict) or not any(isinstance(v, (list, dict)) for v in obj.values())
+
+def _pack_section(texto: str, presupuesto: int, vistos: set) -> str:
+    try:
+        obj = json.loads(texto)
+    except (TypeError, ValueError):
+        # Texto libre (p. ej. OCR): se normaliza y se recorta por tokens
+        limpio = _strip(texto)
+        while limpio and count_tokens(limpio) > presupuesto:
+            limpio = limpio[:int(len(limpio) * 0.9)]
+        return limpio
+
+    if _atom(obj) or isinstance(obj, dict) and "error" in obj: return compact(obj)
+
+    usados, omitidos = 2, 0
+    if isinstance(obj, list):
+        # La lista puede traer ya su `{"omitidos": N}` (pre-triaje de correos): se suma al de aquí
+        obj, omitidos = split_omitted(obj)
+
+    def entra(item) -> bool:
+        """Reserva presupuesto para `item`; False si está repetido o ya no cabe."""
+        nonlocal usados, omitidos
+        c = compact(item)
+        if c in vistos: return False
+        vistos.add(c)
+        coste = count_tokens(c) + 1
+        if usados + coste > presupuesto:
+            omitidos += 1
+            return False
+        usados += coste
+        return True
+
+    def recorta(valor):
+        """Conserva la estructura; los elementos de las listas entran enteros y por orden (prioridad) mientras quepan."""
+        nonlocal usados
+        if isinstance(valor, list):
+            return [recorta(v) if isinstance(v, list) else v for v in valor if isinstance(v, list) or entra(v)]
+        # Los campos escalares (enlace, precio...) son cabecera fija; se recorta lo que cuelga de ellos
+        cabecera = {k: v for k, v in valor.items() if not isinstance(v, (list, dict))}
+        if cabecera: usados += count_tokens(compact(cabecera))
+        return {k: v if k in cabecera else recorta(v) if not _atom(v) else v if entra(v) else None
+                for k, v in valor.items()}
+
+    salida = recorta(obj)
+    if omitidos:
+        if isinstance(salida, dict): salida["omitidos"] = (salida.get("omitidos") or 0) + omitidos
+        else: salida.append({"omitidos": omitidos})
+    return compact(salida)
+
+def pack(datos: Dict[str, str], budgets: Dict[str, int] = CONTEXT_BUDGETS) -> tuple:
+    """Compacta, deduplica y ajusta cada sección a su presupuesto de tokens.
+
+    Las claves pueden llevar sufijo (`bolsa:REP.MC`); el presupuesto se busca
+    por el prefijo. Devuelve `(secciones, stats)` con stats sección -> (tokens
+    originales, tokens enviados); nada se comparte entre llamadas (el modo
+    multiusuario empaqueta varios usuarios a la vez). Registra ambos en el log.
+    """
+    vistos, salida, stats = set(), {}, {}
+    for nombre, texto in datos.items():
+        presupuesto = budgets.get(nombre.split(':')[0], CONTEXT_DEFAULT_BUDGET)
+        salida[nombre] = _pack_section(texto, presupuesto, vistos)
+        stats[nombre] = (count_tokens(texto or ""), count_tokens(salida[nombre]))
+
+    antes = sum(a for a, _ in stats.values())
+    despues = sum(d for _, d in stats.values())
+    detalle = ", ".join(f"{k} {d}/{a}" for k, (a, d) in stats.items())
+    usuario = (current_user() or {}).get("id")
+    logger.info(f"📦 Contexto{f' de {usuario}' if usuario else ''}: {despues} tokens (antes {antes}). {detalle}")
+    return salida, stats
@@ -0,0 +1,110 @@
+# pipeline.py
+import time
+from datetime import datetime
+
+from auth import get_llm
+from collector import build_sources, collect
+from config import PIPELINE_MODE, DELTA_BRIEFINGS, DRY_RUN, logger
+from packing import pack
+from profiling import profiler
+from renderer import (render_agenda, render_tasks, render_market, render_transport,
+                      render_emails, render_briefing, load_output, split_omitted, llm_md)
+
+def triage_emails(correo: str, llm=None) -> str:
+    """Sección de correo: lo único que necesita criterio y por tanto el LLM.
+
+    Si no hay correo no se llama al LLM; si el LLM falla se lista el correo
+    sin priorizar para que el briefing salga igualmente.
+    """
+    correos, omitidos = split_omitted(load_output(correo) or [])
+    if not correos: return render_emails(correo)
+    mas = f"\n_(+{omitidos} de baja prioridad)_" if omitidos else ""
+    try:
+        llm = llm or get_llm()
+        return llm_md(llm.call([
+            {"role": "system", "content": "Eres un asistente ejecutivo. Solo reportas lo vital. NO inventas datos."},
+            {"role": "user", "content": (
+                "De estos correos, lista solo los urgentes o que requieren acción, en viñetas "
+                "(máx. 5, formato: • *Asunto* — remitente: motivo). Si no hay ninguno, responde 'Nada urgente.'\n\n"
+                + pack({"correo": correo})[0]["correo"]
+            )},
+        ]).strip()) + mas
+    except Exception as e:
+        logger.warning(f"⚠️ LLM no disponible para el correo ({e}). Se usa la lista sin priorizar.")
+        return render_emails(correo)
+
+def deliver(briefing: str) -> list:
+    """Envía el briefing por todos los canales configurados a la vez, sin pasar por el LLM.
+
+    Devuelve el resultado de cada canal (`estado` "enviado", "duplicado", "simulado" con DRY_RUN o "error: ...").
+    """
+    from tools.messaging import broadcast
+
+    return broadcast(briefing)
+
+def run_pipeline(llm=None, datos: dict = None, sin_cambios=(), desde: str = None) -> str:
+    """Modo directo: recolectores como funciones, secciones por plantilla y el LLM solo para el correo.
+
+    `datos` permite pasar resultados ya recogidos (modo multiusuario, briefings
+    incrementales); las fuentes de `sin_cambios` solo se mencionan al final.
+    """
+    fecha = datetime.now().strftime('%d/%m/%Y')
+    if datos is None:
+        with profiler.span("collect"):
+            datos = collect(build_sources())
+
+    # Solo las secciones de fuentes activas
+    secciones = {}
+    with profiler.span("render"):
+        if "agenda" in datos: secciones["agenda"] = render_agenda(datos["agenda"])
+        if "tareas" in datos: secciones["tareas"] = render_tasks(datos["tareas"])
+        if "bolsa" in datos or "noticias" in datos:
+            secciones["mercado"] = render_market(datos.get("bolsa"), datos.get("noticias"))
+        if "transporte" in datos: secciones["transporte"] = render_transport(datos["transporte"])
+    if "correo" in datos:
+        with profiler.span("triage:correo"):
+            secciones["correo"] = triage_emails(datos["correo"], llm)
+    briefing = render_briefing(fecha, secciones, sin_cambios, desde)
+    with profiler.span("deliver"):
+        resultados = deliver(briefing)
+    for r in resultados:
+        logger.info(f"📤 {r['canal']}: {r['estado']} ({r['enviadas']}/{r['partes']} partes)")
+    return briefing
+
+def run_briefing(mode: str = PIPELINE_MODE, datos: dict = None):
+    """Un briefing completo en el modo indicado ("crew" o "directo").
+
+    Con DELTA_BRIEFINGS, el briefing solo recibe lo nuevo desde la ejecución
+    anterior del día y omite las secciones sin cambios.
+    """
+    import snapshots
+    from tools.messaging import delivered_since
+
+    inicio = time.time()
+    if datos is None:
+        with profiler.span("collect"):
+            datos = collect(build_sources())
+    novedades, sin_cambios, desde = datos, [], None
+    if DELTA_BRIEFINGS:
+        with profiler.span("delta"):
+            novedades, sin_cambios, desde = snapshots.changes(datos)
+        if sin_cambios: logger.info(f"♻️ Sin cambios desde las {desde}: {', '.join(sin_cambios)}.")
+
+    if mode == "directo" or not novedades:
+        # Sin novedades no hace falta el crew: el aviso se compone sin LLM
+        resultado = run_pipeline(datos=novedades, sin_cambios=sin_cambios, desde=desde)
+    else:
+        from crew_setup import create_crew
+        resultado = create_crew(datos=novedades, sin_cambios=sin_cambios, desde=desde).kickoff()
+    # Solo si algún canal lo entregó: si no, lo nuevo (instantánea, correos) se incluirá en el siguiente
+    if DRY_RUN:
+        logger.info("🧪 DRY_RUN: no se guarda la instantánea ni se marcan los correos.")
+        return resultado
+    if not delivered_since(inicio):
+        logger.warning("⚠️ Ningún canal entregó el briefing: no se guarda la instantánea ni se marcan los correos.")
+        return resultado
+    if DELTA_BRIEFINGS: snapshots.save(datos)
+    if "correo" in datos:
+        from tools.google_suite import mark_reported
+        mark_reported()
+    return resultado
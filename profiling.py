@@ -0,0 +1,190 @@
+# profiling.py
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import PROFILE_DIR, PROM_TEXTFILE, logger
+
+_etapa = contextvars.ContextVar("etapa", default="(sin etapa)")
+
+def propagate(fn):
+    """Envuelve `fn` para que un hilo de un pool herede el contexto (etapa, usuario) de quien lo crea."""
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        # Un Context no puede estar activo en dos hilos a la vez: cada llamada usa su copia
+        return ctx.copy().run(fn, *args, **kwargs)
+    return run
+
+class Profiler:
+    """Acumula, por etapa, tiempo, llamadas HTTP, bytes, reintentos y tokens del LLM."""
+
+    CAMPOS = ("llamadas", "segundos", "max_segundos", "http", "bytes", "reintentos", "errores",
+              "tokens_prompt", "tokens_completion")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.inicio = time.time()
+            self.etapas = defaultdict(lambda: dict.fromkeys(self.CAMPOS, 0))
+            self.tipos = {}
+            self._t_crew = self._t_ultima = time.perf_counter()
+
+    def _add(self, etapa: str, **valores):
+        with self._lock:
+            e = self.etapas[etapa]
+            for k, v in valores.items():
+                if k == "max_segundos": e[k] = max(e[k], v)
+                else: e[k] += v
+
+    @contextmanager
+    def span(self, etapa: str, tipo: str = "etapa"):
+        """Mide una etapa; el HTTP y los tokens que ocurran dentro se le atribuyen."""
+        self.tipos.setdefault(etapa, tipo)
+        token = _etapa.set(etapa)
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self._add(etapa, errores=1)
+            raise
+        finally:
+            dt = time.perf_counter() - t0
+            _etapa.reset(token)
+            self._add(etapa, llamadas=1, segundos=dt, max_segundos=dt)
+
+    def record(self, etapa: str, segundos: float, tipo: str = "etapa"):
+        """Registra una etapa medida desde fuera (p. ej. callbacks de tareas de crewai)."""
+        self.tipos.setdefault(etapa, tipo)
+        self._add(etapa, llamadas=1, segundos=segundos, max_segundos=segundos)
+
+    def start_crew(self):
+        """Marca el arranque del crew para medir sus tareas."""
+        self._t_crew = self._t_ultima = time.perf_counter()
+
+    def task_done(self, etapa: str, asincrona: bool = True):
+        """Callback para `Task(callback=...)` de crewai.
+
+        Las tareas asíncronas corren a la vez desde el arranque del crew; una
+        síncrona empieza cuando termina la última tarea anterior.
+        """
+        def cb(_output):
+            ahora = time.perf_counter()
+            with self._lock:
+                desde = self._t_crew if asincrona else self._t_ultima
+                self._t_ultima = max(self._t_ultima, ahora)
+            self.record(etapa, ahora - desde, "task")
+        return cb
+
+    def on_http(self, evento: dict):
+        self._add(_etapa.get(), http=1, bytes=evento.get("bytes") or 0,
+                  reintentos=1 if evento.get("intento") else 0,
+                  errores=1 if evento.get("error") or (evento.get("estado") or 0) >= 400 else 0)
+
+    def on_tokens(self, prompt: int, completion: int):
+        self._add(_etapa.get(), tokens_prompt=prompt, tokens_completion=completion)
+
+    def summary(self) -> dict:
+        with self._lock:
+            etapas = {k: {**v, "tipo": self.tipos.get(k, "etapa")} for k, v in self.etapas.items()}
+        return {
+            "inicio": datetime.fromtimestamp(self.inicio).isoformat(timespec="seconds"),
+            "segundos_total": round(time.time() - self.inicio, 3),
+            "etapas": etapas,
+        }
+
+    def export(self) -> dict:
+        """Guarda el perfil JSON de la ejecución y el textfile de Prometheus."""
+        perfil = self.summary()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        ruta = os.path.join(PROFILE_DIR, f"run-{datetime.now():%Y%m%d-%H%M%S}.json")
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(perfil, f, ensure_ascii=False, indent=2)
+
+        lineas = [f"briefing_run_seconds {perfil['segundos_total']}"]
+        metricas = {"segundos": "briefing_stage_seconds", "llamadas": "briefing_stage_calls",
+                    "http": "briefing_stage_http_requests", "bytes": "briefing_stage_http_bytes",
+                    "reintentos": "briefing_stage_retries", "errores": "briefing_stage_errors",
+                    "tokens_prompt": "briefing_stage_prompt_tokens", "tokens_completion": "briefing_stage_completion_tokens"}
+        for campo, nombre in metricas.items():
+            lineas.append(f"# TYPE {nombre} gauge")
+            for etapa, v in perfil["etapas"].items():
+                etiqueta = etapa.replace('\\', '\\\\').replace('"', '\\"')
+                lineas.append(f'{nombre}{{stage="{etiqueta}",kind="{v["tipo"]}"}} {round(v[campo], 6)}')
+        tmp = PROM_TEXTFILE + ".tmp"
+        os.makedirs(os.path.dirname(PROM_TEXTFILE) or ".", exist_ok=True)
+        with open(tmp, "w") as f:
+            f.write("\n".join(lineas) + "\n")
+        os.replace(tmp, PROM_TEXTFILE)
+        logger.info(f"⏱️ Perfil guardado en {ruta}")
+        return perfil
+
+    def report(self, top: int = 15) -> str:
+        """Resumen de puntos calientes ordenado por tiempo."""
+        perfil = self.summary()
+        total = perfil["segundos_total"] or 1
+        filas = sorted(perfil["etapas"].items(), key=lambda kv: kv[1]["segundos"], reverse=True)[:top]
+        salida = [f"Ejecución: {total:.2f}s",
+                  f"{'etapa':<34}{'tipo':<7}{'s':>8}{'%':>6}{'n':>4}{'http':>6}{'KB':>8}{'retry':>6}{'tok in':>8}{'tok out':>8}"]
+        for etapa, v in filas:
+            salida.append(
+                f"{etapa[:33]:<34}{v['tipo'][:6]:<7}{v['segundos']:>8.2f}{v['segundos'] * 100 / total:>6.0f}"
+                f"{v['llamadas']:>4}{v['http']:>6}{v['bytes'] / 1024:>8.0f}{v['reintentos']:>6}"
+                f"{v['tokens_prompt']:>8}{v['tokens_completion']:>8}"
+            )
+        return "\n".join(salida)
+
+profiler = Profiler()
+
+def traced(nombre: str, tipo: str = "tool"):
+    """Decorador: mide cada llamada como una etapa del perfil."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with profiler.span(nombre, tipo):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def wrap_llm(llm):
+    """Mide cada `llm.call` y sus tokens (reales si el LLM los expone, si no estimados)."""
+    from packing import count_tokens
+
+    original = llm.call
+
+    def _uso():
+        try:
+            u = llm.get_token_usage_summary()
+            return u.prompt_tokens, u.completion_tokens
+        except Exception:
+            return None
+
+    def call(messages, *args, **kwargs):
+        antes = _uso()
+        with profiler.span("llm:call", "llm"):
+            respuesta = original(messages, *args, **kwargs)
+            despues = _uso()
+            if antes and despues and despues != antes:
+                profiler.on_tokens(despues[0] - antes[0], despues[1] - antes[1])
+            elif not (antes and despues):
+                prompt = messages if isinstance(messages, str) else json.dumps(messages, ensure_ascii=False, default=str)
+                profiler.on_tokens(count_tokens(prompt), count_tokens(str(respuesta)))
+        return respuesta
+
+    object.__setattr__(llm, 'call', call)
+    return llm
+
+def install():
+    """Conecta el profiler al cliente HTTP compartido."""
+    from tools.http_client import add_hook
+    add_hook(profiler.on_http)
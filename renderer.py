@@ -0,0 +1,135 @@
+# renderer.py
+import json
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from config import TIMEZONE
+
+NO_DISPONIBLE = "⚠️ Fuente no disponible."
+
+def _md(texto) -> str:
+    """Escapa los caracteres especiales del Markdown de Telegram (solo fuera de entidades)."""
+    texto = str(texto)
+    for c in ('\\', '_', '*', '`', '['):
+        texto = texto.replace(c, '\\' + c)
+    return texto
+
+_SIN_MARCADO = str.maketrans({'*': None, '_': ' ', '`': "'", '[': '(', ']': ')'})
+
+def _ent(texto) -> str:
+    """Texto para dentro de una entidad (`*…*`, `_…_`, `[…]`).
+
+    El Markdown de Telegram no admite escapes dentro de una entidad: se quitan
+    los caracteres de marcado en vez de escaparlos.
+    """
+    return str(texto).translate(_SIN_MARCADO)
+
+def llm_md(texto: str) -> str:
+    """Markdown escrito por el LLM: se respeta si sus entidades están cerradas; si no, se escapa entero."""
+    sin_escapes = re.sub(r'\\.', '', texto)
+    if all(sin_escapes.count(c) % 2 == 0 for c in '*_`') and sin_escapes.count('[') == sin_escapes.count(']'):
+        return texto
+    return _md(texto)
+
+def load_output(raw):
+    """JSON de una herramienta, o None si es un error o texto libre."""
+    try:
+        obj = json.loads(raw) if isinstance(raw, str) else raw
+    except (TypeError, ValueError):
+        return None
+    if isinstance(obj, dict) and "error" in obj: return None
+    return obj
+
+def _num(valor, decimales: int = 2) -> str:
+    """Número con formato español (coma decimal, punto de millar)."""
+    return f"{valor:,.{decimales}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def render_agenda(raw) -> str:
+    eventos = load_output(raw)
+    if eventos is None: return NO_DISPONIBLE
+    if not eventos: return "Agenda libre."
+    lineas = []
+    for e in eventos:
+        inicio = e.get("inicio") or ""
+        # Calendar da la hora con el desfase del evento (p. ej. una cita creada en otra zona)
+        hora = (datetime.fromisoformat(inicio.replace("Z", "+00:00")).astimezone(ZoneInfo(TIMEZONE)).strftime("%H:%M")
+                if "T" in inicio else "Todo el día")
+        cal = f" _({_ent(e['calendario'])})_" if e.get("calendario") not in (None, "primary") else ""
+        lineas.append(f"• {hora} {_md(e.get('titulo') or 'Sin título')}{cal}")
+    return "\n".join(lineas)
+
+def render_tasks(raw) -> str:
+    tareas = load_output(raw)
+    if tareas is None: return NO_DISPONIBLE
+    if not tareas: return "Sin tareas para hoy."
+    return "\n".join(f"• {_md(t['titulo'])} _({_ent(t['lista'])})_" for t in tareas)
+
+def render_market(raw_bolsa, raw_noticias, por_busqueda: int = 3) -> str:
+    lineas = []
+    bolsa = load_output(raw_bolsa)
+    if bolsa is None and raw_bolsa is not None: lineas.append(NO_DISPONIBLE)
+    for q in (bolsa or {}).get("stocks", [bolsa.get("stock")] if bolsa else []):
+        if not q: continue
+        precio = q.get("currentPrice", q.get("regularMarketPrice"))
+        cambio = q.get("regularMarketChangePercent")
+        linea = f"• *{_ent(q.get('symbol', ''))}* {_md(q.get('shortName', ''))}".rstrip()
+        if precio is not None: linea += f": {_num(precio)} {q.get('currency', '')}".rstrip()
+        if cambio is not None: linea += f" ({'+' if cambio >= 0 else ''}{_num(cambio)}%)"
+        lineas.append(linea)
+
+    noticias = (load_output(raw_noticias) or {}).get("news", [])
+    grupos = noticias.values() if isinstance(noticias, dict) else [noticias]
+    for grupo in grupos:
+        if not isinstance(grupo, list): continue
+        for n in grupo[:por_busqueda]:
+            lineas.append(f"• [{_ent(n['titulo'])}]({n['link']})")
+    return "\n".join(lineas) or "Sin datos de mercado."
+
+def render_transport(raw) -> str:
+    datos = load_output(raw)
+    if not isinstance(datos, dict): return NO_DISPONIBLE if raw and str(raw).startswith("Error") else _md(raw or "Sin boletín.")
+    lineas = []
+    for inc in datos.get("incidencias") or []:
+        rutas = ", ".join({"*": "todas", "?": "sin línea"}.get(r, f"L{r}") for r in inc.get("lineas", []))
+        detalle = ", ".join(filter(None, [inc.get("tipo"), inc.get("horario"), inc.get("fechas")]))
+        lineas.append(f"• *{_ent(rutas)}* ({_md(detalle)}): {_md(inc.get('texto', ''))}")
+    if datos.get("otras_lineas"): lineas.append(f"_También afectadas: {_ent(', '.join(datos['otras_lineas']))}_")
+    cuerpo = "\n".join(lineas) or "Sin incidencias en las líneas vigiladas."
+    return f"{cuerpo}\n[Boletín]({datos['enlace']})" if datos.get("enlace") else cuerpo
+
+def split_omitted(items: list) -> tuple:
+    """Separa el `{"omitidos": N}` final de una lista (pre-triaje, presupuesto) de sus elementos."""
+    if items and isinstance(items[-1], dict) and set(items[-1]) == {"omitidos"}:
+        return items[:-1], items[-1]["omitidos"]
+    return items, 0
+
+def render_emails(raw, maximo: int = 5) -> str:
+    """Lista de correos sin criterio de urgencia (respaldo cuando el LLM no está disponible)."""
+    correos = load_output(raw)
+    if correos is None: return NO_DISPONIBLE
+    correos, omitidos = split_omitted(correos)
+    if not correos: return f"_({omitidos} correos de baja prioridad)_" if omitidos else "Bandeja limpia."
+    lineas = [f"• *{_ent(c.get('asunto', ''))}* — {_md(c.get('remitente', ''))}" for c in correos[:maximo]]
+    if len(correos) + omitidos > maximo: lineas.append(f"_(+{len(correos) + omitidos - maximo} más)_")
+    return "\n".join(lineas)
+
+ORDEN = [("📅 Agenda", "agenda"), ("✅ Tareas", "tareas"), ("📧 Correos", "correo"),
+         ("📈 Mercado", "mercado"), ("🚚 Transporte", "transporte")]
+
+# Sección del briefing de cada fuente
+SECCION = {"agenda": "agenda", "tareas": "tareas", "correo": "correo",
+           "bolsa": "mercado", "noticias": "mercado", "transporte": "transporte"}
+
+def unchanged_sections(sin_cambios, presentes=()) -> list:
+    """Títulos de las secciones cuyas fuentes no cambiaron (y que no se van a mostrar)."""
+    claves = {SECCION[f] for f in sin_cambios if f in SECCION} - set(presentes)
+    return [titulo.split(" ", 1)[1] for titulo, clave in ORDEN if clave in claves]
+
+def render_briefing(fecha: str, secciones: dict, sin_cambios=(), desde: str = None) -> str:
+    """Ensambla las secciones presentes en el orden del briefing, con una nota de las que no cambiaron."""
+    partes = [f"*BRIEFING {fecha}*"]
+    partes += [f"*{titulo}*\n{secciones[clave] or 'Sin datos.'}" for titulo, clave in ORDEN if clave in secciones]
+    omitidas = unchanged_sections(sin_cambios, secciones)
+    if omitidas: partes.append(f"_Sin cambios desde las {desde}: {', '.join(omitidas)}._")
+    return "\n\n".join(partes)
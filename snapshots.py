@@ -0,0 +1,99 @@
+# snapshots.py
+import hashlib
+import json
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from config import SNAPSHOT_DAYS, TIMEZONE
+from renderer import load_output
+from storage import user_db, transaction
+
+def _db():
+    db = user_db()
+    db.execute("""CREATE TABLE IF NOT EXISTS snapshots (
+        ts REAL, dia TEXT, fuente TEXT, hash TEXT, datos TEXT, PRIMARY KEY (fuente, ts))""")
+    return db
+
+def _today() -> str:
+    return datetime.now(ZoneInfo(TIMEZONE)).date().isoformat()
+
+def _canonical(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+def _hash(canonico: str) -> str:
+    return hashlib.sha256(canonico.encode()).hexdigest()
+
+def new_items(antes, ahora):
+    """Parte de `ahora` que no estaba en `antes`, con la misma forma (la que esperan las plantillas).
+
+    Las listas se quedan con los elementos nuevos o modificados, los textos de
+    varias líneas con las líneas nuevas y los diccionarios con sus claves que
+    cambian (los valores simples se conservan si algo cambió). Si solo cambian
+    valores simples (p. ej. el enlace de un boletín nuevo con las mismas
+    incidencias), el diccionario pasa entero: sin sus listas no se entendería.
+    Lo que desaparece no se informa. None si no hay nada nuevo.
+    """
+    if antes == ahora: return None
+    if isinstance(ahora, list) and isinstance(antes, list):
+        vistos = {_canonical(x) for x in antes}
+        return [x for x in ahora if _canonical(x) not in vistos] or None
+    if isinstance(ahora, dict) and isinstance(antes, dict):
+        resultado, escalar, contenedor = {}, False, False
+        for k, v in ahora.items():
+            if isinstance(v, (list, dict)) or (isinstance(v, str) and "\n" in v):
+                sub = new_items(antes.get(k), v)
+                if sub is not None:
+                    resultado[k] = sub
+                    contenedor = True
+            else:
+                resultado[k] = v
+                escalar = escalar or antes.get(k) != v
+        if not contenedor: return dict(ahora) if escalar else None
+        return resultado
+    if isinstance(ahora, str) and isinstance(antes, str) and "\n" in ahora:
+        previas = set(antes.splitlines())
+        return "\n".join(l for l in ahora.splitlines() if l not in previas) or None
+    return ahora
+
+def changes(datos: dict) -> tuple:
+    """Compara cada fuente con la última instantánea del día.
+
+    Devuelve `(novedades, sin_cambios, desde)`: las fuentes con algo nuevo
+    (recortadas a lo nuevo), las que no cambiaron y la hora ("HH:MM") de la
+    ejecución de referencia. La primera ejecución del día y las fuentes con
+    error pasan completas.
+    """
+    db = _db()
+    hoy = _today()
+    novedades, sin_cambios, ts_ref = {}, [], None
+    for fuente, raw in datos.items():
+        ahora = load_output(raw)
+        row = None if ahora is None else db.execute(
+            "SELECT ts, hash, datos FROM snapshots WHERE fuente = ? AND dia = ? ORDER BY ts DESC LIMIT 1",
+            (fuente, hoy)).fetchone()
+        if row is None:
+            novedades[fuente] = raw
+            continue
+        ts_ref = max(ts_ref or 0, row[0])
+        nuevo = None if row[1] == _hash(_canonical(ahora)) else new_items(json.loads(row[2]), ahora)
+        if nuevo is None:
+            sin_cambios.append(fuente)
+        else:
+            novedades[fuente] = json.dumps(nuevo, ensure_ascii=False)
+    desde = datetime.fromtimestamp(ts_ref, ZoneInfo(TIMEZONE)).strftime("%H:%M") if ts_ref else None
+    return novedades, sin_cambios, desde
+
+def save(datos: dict):
+    """Guarda las salidas válidas de esta ejecución y purga las de hace más de SNAPSHOT_DAYS días."""
+    db = _db()
+    ts = time.time()
+    filas = []
+    for fuente, raw in datos.items():
+        obj = load_output(raw)
+        if obj is None: continue
+        canonico = _canonical(obj)
+        filas.append((ts, _today(), fuente, _hash(canonico), canonico))
+    with transaction(db):
+        db.executemany("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)", filas)
+        db.execute("DELETE FROM snapshots WHERE ts < ?", (ts - SNAPSHOT_DAYS * 86400,))
@@ -0,0 +1,54 @@
+# storage.py
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config import CACHE_DB
+from users import db_path
+
+_local = threading.local()
+
+def get_db(ruta: str = CACHE_DB) -> sqlite3.Connection:
+    """Conexión SQLite por hilo al almacén local (modo WAL, autocommit).
+
+    Sin argumentos es el almacén compartido (cachés HTTP, cotizaciones, OCR, LLM).
+    """
+    conns = getattr(_local, 'conns', None)
+    if conns is None: conns = _local.conns = {}
+    conn = conns.get(ruta)
+    if conn is None:
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        conn = sqlite3.connect(ruta, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS kv (clave TEXT PRIMARY KEY, valor TEXT)")
+        conns[ruta] = conn
+    return conn
+
+def user_db() -> sqlite3.Connection:
+    """Almacén privado del usuario actual; sin usuario (un solo usuario) es el compartido."""
+    return get_db(db_path() or CACHE_DB)
+
+def kv_get(clave: str, default=None):
+    """Lee un valor de estado (JSON) del usuario actual guardado entre ejecuciones."""
+    row = user_db().execute("SELECT valor FROM kv WHERE clave = ?", (clave,)).fetchone()
+    return json.loads(row[0]) if row else default
+
+def kv_set(clave: str, valor):
+    """Guarda un valor de estado (JSON) del usuario actual entre ejecuciones."""
+    user_db().execute("INSERT OR REPLACE INTO kv (clave, valor) VALUES (?, ?)",
+                     (clave, json.dumps(valor, ensure_ascii=False)))
+
+@contextmanager
+def transaction(db: sqlite3.Connection = None):
+    """Agrupa varias escrituras en una sola transacción (la conexión va en autocommit)."""
+    db = db or get_db()
+    db.execute("BEGIN")
+    try:
+        yield db
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
@@ -0,0 +1,39 @@
+"""Parser de incidencias del boletín de transporte (`tools.incidents`)."""
+from tools.incidents import GENERAL, SIN_LINEA, lookup, parse, parse_block
+
+
+def lineas(texto):
+    return parse_block(texto)["lineas"]
+
+
+def test_abreviatura_l_pegada_al_numero():
+    assert lineas("L44: desvío por obras en la calle Mayor.") == ["44"]
+    assert lineas("Afecta a L 7 y L12.") == ["7", "12"]
+
+
+def test_linea_con_tilde_y_mayusculas():
+    assert lineas("Línea 1: supresión de la parada 2201.") == ["1"]
+    assert lineas("LÍNEA C3 desviada.") == ["C3"]
+
+
+def test_listas_y_rangos():
+    assert lineas("Líneas 3, 5 y 7: cambio de parada provisional.") == ["3", "5", "7"]
+    assert lineas("Líneas 44-46 desviadas por obras.") == ["44", "46"]
+    assert lineas("Líneas 1/2; 9 e 11 con retrasos.") == ["1", "2", "9", "11"]
+
+
+def test_palabras_con_l_no_son_lineas():
+    inc = parse_block("Cortes en la calle del Olmo por obras.")
+    assert inc["lineas"] == [SIN_LINEA]
+
+
+def test_toda_la_red():
+    assert GENERAL in lineas("Huelga en toda la red de 7 a 9 h.")
+
+
+def test_boletin_trocea_avisos_por_l():
+    texto = "L44: desvío por obras.\nL5 suprimida\nhasta nuevo aviso.\nLínea 2: retrasos."
+    incidencias, indice = parse(texto)
+    assert [i["lineas"] for i in incidencias] == [["44"], ["5"], ["2"]]
+    assert incidencias[1]["fechas"] == "hasta nuevo aviso"
+    assert [i["lineas"] for i in lookup(incidencias, indice, ["5"])] == [["5"]]
@@ -0,0 +1,29 @@
+"""`split_message`: troceo de un mensaje al límite de cada canal."""
+import pytest
+
+pytest.importorskip("dotenv")  # messaging -> config
+
+from tools.messaging import split_message
+
+
+def test_mensaje_corto_una_parte():
+    assert split_message("hola", 10) == ["hola"]
+    assert split_message("", 10) == [""]
+
+
+def test_agrupa_secciones_hasta_el_limite():
+    texto = "aaaa\n\nbbbb\n\ncccc"
+    assert split_message(texto, 10) == ["aaaa\n\nbbbb", "cccc"]
+
+
+def test_seccion_larga_se_parte_por_lineas():
+    texto = "uno\ndos\ntres\ncuatro"
+    partes = split_message(texto, 8)
+    assert partes == ["uno\ndos", "tres", "cuatro"]
+
+
+def test_linea_larga_se_corta_por_caracteres_sin_perder_texto():
+    texto = "x" * 25 + "\n\nfin"
+    partes = split_message(texto, 10)
+    assert all(len(p) <= 10 for p in partes)
+    assert "".join(partes).replace("\n", "") == "x" * 25 + "fin"
@@ -0,0 +1,37 @@
+"""`snapshots.new_items`: lo nuevo de una fuente respecto a la instantánea anterior."""
+import pytest
+
+pytest.importorskip("dotenv")  # snapshots -> config
+
+from snapshots import new_items
+
+
+def test_lista_solo_elementos_nuevos():
+    antes = [{"titulo": "A"}, {"titulo": "B"}]
+    ahora = [{"titulo": "A"}, {"titulo": "C"}]
+    assert new_items(antes, ahora) == [{"titulo": "C"}]
+
+
+def test_sin_cambios_devuelve_none():
+    datos = {"incidencias": [{"lineas": ["44"]}], "enlace": "https://x/1"}
+    assert new_items(datos, dict(datos)) is None
+
+
+def test_cambia_lista_conserva_escalares():
+    antes = {"incidencias": [{"lineas": ["44"]}], "enlace": "https://x/1"}
+    ahora = {"incidencias": [{"lineas": ["44"]}, {"lineas": ["1"]}], "enlace": "https://x/1"}
+    assert new_items(antes, ahora) == {"incidencias": [{"lineas": ["1"]}], "enlace": "https://x/1"}
+
+
+def test_solo_cambia_enlace_conserva_incidencias():
+    antes = {"incidencias": [{"lineas": ["44"]}], "otras_lineas": ["2"], "enlace": "https://x/1"}
+    ahora = {"incidencias": [{"lineas": ["44"]}], "otras_lineas": ["2"], "enlace": "https://x/2"}
+    assert new_items(antes, ahora) == ahora
+
+
+def test_texto_multilinea_solo_lineas_nuevas():
+    assert new_items("uno\ndos", "uno\ntres\ncuatro") == "tres\ncuatro"
+
+
+def test_lo_que_desaparece_no_se_informa():
+    assert new_items([{"id": 1}, {"id": 2}], [{"id": 1}]) is None
@@ -0,0 +1,28 @@
+"""`tools.load` desde varios hilos a la vez (como `collector.collect` en frío)."""
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("dotenv")  # profiling -> config
+
+import tools
+
+
+def test_load_concurrente_no_devuelve_modulo_a_medias(tmp_path, monkeypatch):
+    (tmp_path / "modulo_lento.py").write_text("import time\ntime.sleep(0.3)\nuno = 1\ndos = 2\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "modulo_lento", raising=False)
+
+    errores, valores = [], []
+    def usar(attr):
+        try:
+            valores.append(getattr(tools.load("modulo_lento"), attr))
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=usar, args=(attr,)) for attr in ("uno", "dos", "uno")]
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    assert not errores
+    assert sorted(valores) == [1, 1, 2]
@@ -0,0 +1,69 @@
+# tools/__init__.py
+"""Registro perezoso de herramientas.
+
+`from tools import read_emails` no importa nada pesado: el módulo de la
+herramienta (y sus dependencias: googleapiclient, yfinance, Pillow, twilio...)
+se carga la primera vez que se accede a ella. Las herramientas se ejecutan
+como funciones (`.run(**kwargs)`) y solo se convierten en herramientas de
+crewai, importando crewai, cuando se le dan a un agente (`.crewai()`).
+"""
+import functools
+import importlib
+import sys
+
+REGISTRO = {
+    "read_emails": "tools.google_suite",
+    "get_todays_agenda": "tools.google_suite",
+    "get_todays_tasks": "tools.google_suite",
+    "get_stock_price": "tools.market",
+    "get_financial_news": "tools.market",
+    "inc_transport": "tools.transport",
+    "send_briefing": "tools.messaging",
+    "send_telegram": "tools.messaging",
+    "send_pushover": "tools.messaging",
+    "send_whatsapp": "tools.messaging",
+}
+
+class Tool:
+    """Función con nombre de herramienta; la versión crewai se construye al pedirla."""
+
+    def __init__(self, nombre: str, fn):
+        functools.update_wrapper(self, fn)
+        self.name = nombre
+        self.description = fn.__doc__
+        self.fn = fn
+        self._crewai = None
+
+    def run(self, *args, **kwargs):
+        return self.fn(*args, **kwargs)
+
+    __call__ = run
+
+    def crewai(self):
+        """La misma herramienta como `crewai.tools.BaseTool` (para `Agent(tools=[...])`)."""
+        if self._crewai is None:
+            from crewai.tools import tool as crewai_tool
+            self._crewai = crewai_tool(self.name)(self.fn)
+        return self._crewai
+
+def tool(nombre: str):
+    """Decorador equivalente a `crewai.tools.tool` que no importa crewai."""
+    def deco(fn):
+        return Tool(nombre, fn)
+    return deco
+
+def load(modulo: str):
+    """Importa un módulo de herramientas midiendo su coste como etapa `import:<módulo>`."""
+    if modulo in sys.modules:
+        # Sin atajo por sys.modules: si otro hilo lo está importando, import_module
+        # espera a que termine (lock por módulo) en vez de devolverlo a medias
+        return importlib.import_module(modulo)
+    from profiling import profiler
+    with profiler.span(f"import:{modulo}", "import"):
+        return importlib.import_module(modulo)
+
+def __getattr__(nombre: str):
+    if nombre in REGISTRO:
+        valor = globals()[nombre] = getattr(load(REGISTRO[nombre]), nombre)
+        return valor
+    raise AttributeError(f"module 'tools' has no attribute '{nombre}'")
@@ -0,0 +1,102 @@
+"""Bucle asyncio compartido y cliente httpx asíncrono para las herramientas de red.
+
+Un hilo en segundo plano ejecuta un único bucle y todas las corrutinas comparten
+un `httpx.AsyncClient` (pool de conexiones, HTTP/2 si h2 está instalado) con dos
+límites: ASYNC_CONCURRENCY peticiones en vuelo en total y HTTP_HOST_LIMIT por
+host. Cientos de descargas simultáneas no ocupan un hilo cada una. Las
+herramientas síncronas (crewai, modo directo) esperan a su corrutina con `run()`.
+"""
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+from config import HTTP_TIMEOUT, HTTP_RETRIES, HTTP_HOST_LIMIT, HTTP2, ASYNC_CONCURRENCY
+from tools.http_client import IDEMPOTENTES, RETRY_STATUS, emit, _backoff
+
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+_limite = None
+_hosts = {}
+
+def loop() -> asyncio.AbstractEventLoop:
+    """Bucle compartido; se arranca en su hilo la primera vez."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True, name="aio").start()
+        return _loop
+
+def run(coro, timeout: float = None):
+    """Ejecuta una corrutina en el bucle compartido y espera su resultado (envoltorio síncrono).
+
+    El contexto (etapa del perfil, usuario actual) pasa a la corrutina.
+    """
+    try:
+        actual = asyncio.get_running_loop()
+    except RuntimeError:
+        actual = None
+    if actual is not None and actual is _loop:
+        coro.close()
+        raise RuntimeError("run() bloquearía el bucle compartido: usa await")
+    return asyncio.run_coroutine_threadsafe(coro, loop()).result(timeout)
+
+def _get_client():
+    """Cliente y límites se crean dentro del bucle, que es el único que los usa."""
+    global _client, _limite
+    if _client is None:
+        import httpx
+        try:
+            import h2  # noqa: F401  (httpx solo habla HTTP/2 si h2 está instalado)
+            http2 = HTTP2
+        except ImportError:
+            http2 = False
+        _client = httpx.AsyncClient(
+            http2=http2, timeout=HTTP_TIMEOUT, follow_redirects=True, headers={"User-Agent": "Mozilla/5.0"},
+            limits=httpx.Limits(max_connections=ASYNC_CONCURRENCY, max_keepalive_connections=HTTP_HOST_LIMIT * 8),
+        )
+        _limite = asyncio.Semaphore(ASYNC_CONCURRENCY)
+    return _client
+
+async def request(method: str, url: str, consume=None, **kwargs) -> tuple:
+    """Petición con límites de concurrencia y reintentos con jitter (solo métodos idempotentes).
+
+    `consume(resp)` (corrutina) procesa la respuesta en streaming y puede dejar
+    de leer antes del final; sin él se lee el cuerpo entero. Devuelve `(resp, valor)`.
+    """
+    import httpx
+
+    client = _get_client()
+    host = urlparse(url).netloc
+    if host not in _hosts: _hosts[host] = asyncio.Semaphore(HTTP_HOST_LIMIT)
+    intentos = HTTP_RETRIES + 1 if method.upper() in IDEMPOTENTES else 1
+
+    for intento in range(intentos):
+        evento = {"metodo": method.upper(), "host": host, "intento": intento}
+        espera = None
+        # Los límites se retienen solo durante el intento, no durante la espera del reintento
+        async with _limite, _hosts[host]:
+            t0 = time.perf_counter()
+            try:
+                async with client.stream(method, url, **kwargs) as resp:
+                    if resp.status_code in RETRY_STATUS and intento < intentos - 1:
+                        cabecera = resp.headers.get('Retry-After')
+                        espera = float(cabecera) if cabecera and cabecera.isdigit() else _backoff(intento)
+                        valor = None
+                    else:
+                        valor = await consume(resp) if consume else await resp.aread()
+                emit({**evento, "estado": resp.status_code, "segundos": time.perf_counter() - t0,
+                      "bytes": resp.num_bytes_downloaded})
+            except httpx.TransportError as e:
+                emit({**evento, "estado": None, "segundos": time.perf_counter() - t0, "bytes": 0, "error": str(e)})
+                if intento == intentos - 1: raise
+                espera = _backoff(intento)
+        if espera is None: return resp, valor
+        await asyncio.sleep(espera)
+
+async def get(url: str, **kwargs):
+    """GET con el cuerpo ya leído."""
+    resp, _ = await request("GET", url, **kwargs)
+    return resp
@@ -1,61 +1,468 @@
 import json
-from datetime import datetime, timedelta
-from googleapiclient.discovery import build
-from crewai.tools import tool
-from auth import authenticate_google
+import re
+import sqlite3
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from email.utils import parseaddr
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+from googleapiclient.errors import HttpError
+from tools import tool
+from profiling import traced, propagate
+from auth import get_service
+from config import (HTTP_RETRIES, EMAIL_MAX, EMAIL_ONLY_NEW, GMAIL_BATCH_SIZE, SQL_CHUNK, TIMEZONE, EMAIL_TOP_K, EMAIL_MIN_SCORE,
+                    EMAIL_ALLOW, EMAIL_BLOCK, EMAIL_KEYWORDS, EMAIL_WEIGHTS, EMAIL_LABEL_WEIGHTS,
+                    GOOGLE_WORKERS, CALENDAR_IDS, CALENDAR_SYNC_DAYS, TASKS_SYNC, logger)
+from storage import user_db, kv_get, kv_set, transaction
+from tools.http_client import _backoff
+from users import setting, current_user
 
-@tool("Leer correo")
-def read_emails() -> str:
-    """Lee correos prioritarios de hoy."""
-    creds = authenticate_google()
-    if not creds: return "Error auth."
-    
-    service = build("gmail", "v1", credentials=creds)
+def list_message_ids(service, query: str, limite: int = EMAIL_MAX, campo: str = 'id') -> list:
+    """Lista IDs de mensajes (o `campo`, p. ej. threadId) paginando más allá del límite de una sola página."""
+    ids, page_token = [], None
+    while len(ids) < limite:
+        resp = service.users().messages().list(
+            userId='me', q=query, maxResults=min(500, limite - len(ids)),
+            pageToken=page_token, fields=f'messages/{campo},nextPageToken'
+        ).execute()
+        ids.extend(m[campo] for m in resp.get('messages', []))
+        page_token = resp.get('nextPageToken')
+        if not page_token: break
+    return ids[:limite]
+
+def _transient(error) -> bool:
+    """Errores de un elemento del batch que merecen reintento: 429, 5xx, cuota (403 rateLimitExceeded) y red."""
+    if not isinstance(error, HttpError): return True
+    estado = error.resp.status
+    return estado == 429 or estado >= 500 or (estado == 403 and "ratelimit" in str(error).lower())
+
+def fetch_metadata(service, ids: list) -> tuple:
+    """Descarga solo cabeceras, etiquetas, hilo, snippet y fecha de cada mensaje en peticiones batch.
+
+    Los elementos con error transitorio se reintentan con backoff. Devuelve
+    `(correos, fallidos)`: id -> correo y los ids que siguen sin descargar. Un
+    mensaje borrado (404) u otro error definitivo no se reintenta ni cuenta como fallido.
+    """
+    mensajes, errores = {}, {}
+
+    def _cb(request_id, response, exception):
+        if exception is None: mensajes[request_id] = response
+        else: errores[request_id] = exception
+
+    pendientes = list(ids)
+    for intento in range(HTTP_RETRIES + 1):
+        if intento:
+            logger.info(f"🔁 Gmail: reintento {intento}/{HTTP_RETRIES} de {len(pendientes)} mensajes.")
+            time.sleep(_backoff(intento - 1))
+        errores.clear()
+        for i in range(0, len(pendientes), GMAIL_BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=_cb)
+            for msg_id in pendientes[i:i + GMAIL_BATCH_SIZE]:
+                batch.add(service.users().messages().get(
+                    userId='me', id=msg_id, format='metadata',
+                    metadataHeaders=['Subject', 'From', 'List-Unsubscribe', 'Precedence'],
+                    fields='id,threadId,labelIds,snippet,internalDate,payload/headers'
+                ), request_id=msg_id)
+            batch.execute()
+        for msg_id, e in errores.items():
+            if not _transient(e) and getattr(e, 'resp', None) is not None and e.resp.status != 404:
+                logger.warning(f"⚠️ Gmail: mensaje {msg_id} omitido ({e.resp.status}).")
+        pendientes = [i for i in pendientes if i in errores and _transient(errores[i])]
+        if not pendientes: break
+    if pendientes:
+        logger.warning(f"⚠️ Gmail: {len(pendientes)} mensajes sin descargar tras {HTTP_RETRIES} reintentos.")
+
+    correos = {}
+    for msg_id in ids:
+        txt = mensajes.get(msg_id)
+        if not txt: continue
+        headers = {h['name']: h['value'] for h in txt.get('payload', {}).get('headers', [])}
+        correos[msg_id] = {
+            "remitente": headers.get('From', ''),
+            "asunto": headers.get('Subject', 'Sin Asunto'),
+            "snippet": txt.get('snippet', '')[:100],
+            "hilo": txt.get('threadId', ''),
+            "etiquetas": txt.get('labelIds', []),
+            "recibido": int(txt.get('internalDate') or 0),  # ms desde epoch
+            # Boletines y notificaciones automáticas
+            "masivo": 'List-Unsubscribe' in headers or headers.get('Precedence', '').lower() in ('bulk', 'list'),
+        }
+    return correos, pendientes
+
+def _history_ids(service, start_id: str) -> tuple:
+    """IDs añadidos a la bandeja principal desde `start_id` y el historyId actual."""
+    ids, page_token, history_id = [], None, start_id
+    while True:
+        resp = service.users().history().list(
+            userId='me', startHistoryId=start_id, historyTypes='messageAdded',
+            labelId='CATEGORY_PERSONAL', pageToken=page_token,
+            fields='history/messagesAdded/message/id,historyId,nextPageToken'
+        ).execute()
+        for h in resp.get('history', []):
+            ids.extend(m['message']['id'] for m in h.get('messagesAdded', []))
+        history_id = resp.get('historyId', history_id)
+        page_token = resp.get('nextPageToken')
+        if not page_token: break
+    return list(dict.fromkeys(ids)), history_id
+
+def _full_sync(service) -> tuple:
+    """Sincronización completa del día; el historyId se toma antes de listar para no perder nada."""
+    history_id = service.users().getProfile(userId='me', fields='historyId').execute()['historyId']
     hoy = datetime.now().strftime("%Y/%m/%d")
     mañana = (datetime.now() + timedelta(days=1)).strftime("%Y/%m/%d")
-    
-    results = service.users().messages().list(userId='me', q=f"after:{hoy} before:{mañana} category:primary", maxResults=20).execute()
-    msgs = results.get('messages', [])
-    
-    correos = []
-    for m in msgs:
-        txt = service.users().messages().get(userId='me', id=m['id']).execute()
-        headers = txt.get('payload', {}).get('headers', [])
-        subj = next((h['value'] for h in headers if h['name'] == 'Subject'), 'Sin Asunto')
-        correos.append({"asunto": subj, "snippet": txt.get('snippet', '')[:100]})
-        
+    return list_message_ids(service, f"after:{hoy} before:{mañana} category:primary"), history_id
+
+def _mail_db():
+    db = user_db()
+    db.execute("""CREATE TABLE IF NOT EXISTS gmail_messages (
+        id TEXT PRIMARY KEY, fecha TEXT, remitente TEXT, asunto TEXT, snippet TEXT,
+        reportado INTEGER DEFAULT 0, hilo TEXT, etiquetas TEXT, masivo INTEGER DEFAULT 0, recibido INTEGER DEFAULT 0)""")
+    # Bases creadas antes del pre-triaje
+    for columna in ("hilo TEXT", "etiquetas TEXT", "masivo INTEGER DEFAULT 0", "recibido INTEGER DEFAULT 0"):
+        try:
+            db.execute(f"ALTER TABLE gmail_messages ADD COLUMN {columna}")
+        except sqlite3.OperationalError:
+            pass
+    return db
+
+def sync_emails(service) -> int:
+    """Trae a la base local solo los mensajes nuevos desde el último historyId.
+
+    Si el historial ha caducado (404) se hace una sincronización completa del día.
+    Devuelve el número de mensajes nuevos guardados.
+    """
+    db = _mail_db()
+    start_id = kv_get('gmail.history_id')
+    ids = None
+    if start_id:
+        try:
+            ids, history_id = _history_ids(service, start_id)
+        except HttpError as e:
+            if e.resp.status != 404: raise
+            logger.warning("⚠️ Historial de Gmail caducado. Sincronización completa.")
+    if ids is None:
+        ids, history_id = _full_sync(service)
+
+    conocidos = set()
+    for i in range(0, len(ids), SQL_CHUNK):
+        trozo = ids[i:i + SQL_CHUNK]
+        conocidos.update(r[0] for r in db.execute(
+            f"SELECT id FROM gmail_messages WHERE id IN ({','.join('?' * len(trozo))})", trozo))
+    pendientes = [i for i in ids if i not in conocidos]
+    nuevos, fallidos = fetch_metadata(service, pendientes[:EMAIL_MAX])
+
+    hoy = datetime.now().strftime("%Y-%m-%d")
+    with transaction(db):
+        db.executemany(
+            "INSERT OR IGNORE INTO gmail_messages (id, fecha, remitente, asunto, snippet, hilo, etiquetas, masivo, recibido) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(i, hoy, c['remitente'], c['asunto'], c['snippet'], c['hilo'], " ".join(c['etiquetas']), int(c['masivo']),
+              c['recibido']) for i, c in nuevos.items()]
+        )
+        # Poda: solo se conserva una semana
+        db.execute("DELETE FROM gmail_messages WHERE fecha < ?",
+                   ((datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d"),))
+    # Si faltan mensajes (fallidos o por encima de EMAIL_MAX) el historyId no avanza:
+    # la próxima sincronización los vuelve a listar y solo descarga los que no están
+    if fallidos or len(pendientes) > EMAIL_MAX:
+        logger.warning(f"⚠️ Gmail: {len(fallidos) + max(0, len(pendientes) - EMAIL_MAX)} mensajes pendientes; "
+                       "se reintentarán en la próxima sincronización.")
+    else:
+        kv_set('gmail.history_id', history_id)
+    return len(nuevos)
+
+def _fold(texto: str) -> str:
+    """Minúsculas y sin tildes, para comparar palabras clave."""
+    return "".join(c for c in unicodedata.normalize("NFKD", texto.lower()) if not unicodedata.combining(c))
+
+class EmailRanker:
+    """Puntuación local de correos con reglas precompiladas.
+
+    Remitentes permitidos y bloqueados (dirección o dominio, en conjuntos),
+    etiquetas de Gmail, hilos en los que el usuario ha escrito y palabras clave
+    (una sola expresión regular). Puntuar cientos de correos cuesta milisegundos.
+    """
+
+    def __init__(self, permitidos, bloqueados, palabras):
+        self.permitidos = frozenset(p.lstrip('@') for p in permitidos)
+        self.bloqueados = frozenset(b.lstrip('@') for b in bloqueados)
+        claves = sorted({_fold(p) for p in palabras}, key=len, reverse=True)
+        self.palabras = re.compile(r"\b(?:" + "|".join(map(re.escape, claves)) + r")\b") if claves else None
+
+    @staticmethod
+    def _match(conjunto: frozenset, direccion: str) -> bool:
+        """La dirección exacta o su dominio (o un dominio padre) están en el conjunto."""
+        if not conjunto: return False
+        if direccion in conjunto: return True
+        partes = direccion.rpartition('@')[2].split('.')
+        return any('.'.join(partes[i:]) in conjunto for i in range(len(partes) - 1))
+
+    def _palabras(self, texto: str) -> int:
+        return len(set(self.palabras.findall(_fold(texto)))) if self.palabras else 0
+
+    def score(self, correo: dict, hilos_propios: set = frozenset()):
+        """Puntuación del correo, o None si se descarta (remitente bloqueado o enviado por el usuario)."""
+        direccion = parseaddr(correo['remitente'])[1].lower()
+        etiquetas = correo.get('etiquetas') or []
+        if 'SENT' in etiquetas or self._match(self.bloqueados, direccion): return None
+        puntos = sum(EMAIL_LABEL_WEIGHTS.get(e, 0) for e in etiquetas)
+        if self._match(self.permitidos, direccion): puntos += EMAIL_WEIGHTS["permitido"]
+        if correo.get('hilo') in hilos_propios: puntos += EMAIL_WEIGHTS["conversacion"]
+        if correo.get('masivo'): puntos += EMAIL_WEIGHTS["masivo"]
+        puntos += EMAIL_WEIGHTS["palabra_asunto"] * self._palabras(correo['asunto'])
+        puntos += EMAIL_WEIGHTS["palabra"] * self._palabras(correo['snippet'])
+        return puntos
+
+@lru_cache(maxsize=32)
+def _ranker(permitidos: tuple, bloqueados: tuple, palabras: tuple) -> EmailRanker:
+    return EmailRanker(permitidos, bloqueados, palabras)
+
+def rank_emails(correos: list, hilos_propios: set = frozenset(), top_k: int = EMAIL_TOP_K) -> list:
+    """Los `top_k` correos con al menos EMAIL_MIN_SCORE puntos, mejor puntuados primero.
+
+    A igualdad de puntos van antes los más recientes (`recibido`, el internalDate de Gmail).
+    """
+    ranker = _ranker(tuple(setting("email_allow", EMAIL_ALLOW)), tuple(setting("email_block", EMAIL_BLOCK)),
+                     tuple(setting("email_keywords", EMAIL_KEYWORDS)))
+    puntuados = []
+    for c in correos:
+        puntos = ranker.score(c, hilos_propios)
+        if puntos is not None and puntos >= EMAIL_MIN_SCORE: puntuados.append((puntos, c))
+    puntuados.sort(key=lambda t: (-t[0], -(t[1].get('recibido') or 0)))
+    return [c for _, c in puntuados[:top_k]]
+
+def _own_threads(service) -> set:
+    """Hilos en los que el usuario ha escrito esta semana: una respuesta en ellos suele esperar contestación."""
+    return set(list_message_ids(service, "in:sent newer_than:7d", campo='threadId'))
+
+_leidos = {}  # id de usuario (None sin registro) -> ids leídos pendientes de marcar como reportados
+
+def _user_key():
+    return (current_user() or {}).get("id")
+
+@tool("Leer correo")
+@traced("tool:read_emails")
+def read_emails() -> str:
+    """Lee correos prioritarios nuevos desde el último briefing."""
+    service = get_service("gmail", "v1")
+    if not service: return "Error auth."
+
+    sync_emails(service)
+    db = _mail_db()
+    filtro = "reportado = 0" if EMAIL_ONLY_NEW else "fecha = date('now', 'localtime')"
+    rows = db.execute(f"SELECT id, remitente, asunto, snippet, hilo, etiquetas, masivo, recibido FROM gmail_messages "
+                      f"WHERE {filtro} ORDER BY rowid").fetchall()
+    # Se marcan como reportados solo cuando el briefing se entrega (mark_reported)
+    if EMAIL_ONLY_NEW: _leidos[_user_key()] = [r[0] for r in rows]
+
+    # Pre-triaje local: el LLM solo ve los EMAIL_TOP_K más relevantes
+    candidatos = [{"remitente": r[1], "asunto": r[2], "snippet": r[3], "hilo": r[4],
+                   "etiquetas": (r[5] or "").split(), "masivo": bool(r[6]), "recibido": r[7]} for r in rows]
+    elegidos = rank_emails(candidatos, _own_threads(service) if candidatos else set())
+    if len(elegidos) < len(candidatos):
+        logger.info(f"📧 Pre-triaje: {len(elegidos)} de {len(candidatos)} correos pasan al briefing.")
+    correos = [{"remitente": c["remitente"], "asunto": c["asunto"], "snippet": c["snippet"]} for c in elegidos]
+    # Los que no pasan también se marcan como reportados: al menos queda constancia de cuántos son
+    if len(elegidos) < len(candidatos): correos.append({"omitidos": len(candidatos) - len(elegidos)})
     return json.dumps(correos, ensure_ascii=False)
 
+def mark_reported():
+    """Marca como reportados los correos que leyó `read_emails` para el usuario actual.
+
+    La llama el pipeline tras entregar el briefing: si el triaje o la entrega
+    fallan, esos correos vuelven a salir en el siguiente.
+    """
+    ids = _leidos.pop(_user_key(), [])
+    if not ids: return
+    db = _mail_db()
+    with transaction(db):
+        db.executemany("UPDATE gmail_messages SET reportado = 1 WHERE id = ?", [(i,) for i in ids])
+
+def day_bounds(dia=None) -> tuple:
+    """Inicio y fin (exclusivo) del día en la zona horaria local, con DST correcto."""
+    tz = ZoneInfo(TIMEZONE)
+    dia = dia or datetime.now(tz).date()
+    inicio = datetime.combine(dia, dtime.min, tzinfo=tz)
+    fin = datetime.combine(dia + timedelta(days=1), dtime.min, tzinfo=tz)
+    return inicio, fin
+
+def _cal_db():
+    db = user_db()
+    db.execute("""CREATE TABLE IF NOT EXISTS calendar_events (
+        calendar_id TEXT, event_id TEXT, inicio_ts REAL, fin_ts REAL,
+        inicio TEXT, titulo TEXT, PRIMARY KEY (calendar_id, event_id))""")
+    return db
+
+def _event_ts(punto: dict) -> float:
+    """Timestamp de un `start`/`end` de Calendar (dateTime o día completo en hora local)."""
+    if 'dateTime' in punto: return datetime.fromisoformat(punto['dateTime'].replace('Z', '+00:00')).timestamp()
+    return day_bounds(date.fromisoformat(punto['date']))[0].timestamp()
+
+def sync_calendar(service, calendar_id: str):
+    """Sincroniza un calendario en la caché local usando su syncToken.
+
+    La primera vez (o si el token caduca con 410) se hace una carga completa
+    de los próximos CALENDAR_SYNC_DAYS días; después solo se descargan los
+    cambios. La ventana acota la expansión de los eventos recurrentes
+    (singleEvents); cuando hoy la alcanza se recarga con una ventana nueva, o
+    los eventos que ya existían más allá de ella no llegarían nunca.
+    """
+    db = _cal_db()
+    clave = f'calendar.sync.{calendar_id}'
+    clave_hasta = f'calendar.until.{calendar_id}'
+    token = kv_get(clave)
+    if token and (kv_get(clave_hasta) or 0) < day_bounds()[1].timestamp():
+        db.execute("DELETE FROM calendar_events WHERE calendar_id = ?", (calendar_id,))
+        token = None
+    params = {"calendarId": calendar_id, "singleEvents": True, "maxResults": 2500, "timeZone": TIMEZONE,
+              "fields": "items(id,status,summary,start,end),nextPageToken,nextSyncToken"}
+    if token:
+        params["syncToken"] = token
+    else:
+        inicio = day_bounds()[0]
+        hasta = inicio + timedelta(days=CALENDAR_SYNC_DAYS)
+        params.update(timeMin=inicio.isoformat(), timeMax=hasta.isoformat())
+
+    cambios, page_token = [], None
+    try:
+        while True:
+            resp = service.events().list(pageToken=page_token, **params).execute()
+            cambios.extend(resp.get('items', []))
+            page_token = resp.get('nextPageToken')
+            if not page_token: break
+    except HttpError as e:
+        if e.resp.status != 410 or not token: raise
+        logger.warning(f"⚠️ syncToken caducado en '{calendar_id}'. Recarga completa.")
+        db.execute("DELETE FROM calendar_events WHERE calendar_id = ?", (calendar_id,))
+        kv_set(clave, None)
+        return sync_calendar(service, calendar_id)
+
+    with transaction(db):
+        for e in cambios:
+            if e.get('status') == 'cancelled':
+                db.execute("DELETE FROM calendar_events WHERE calendar_id = ? AND event_id = ?", (calendar_id, e['id']))
+            elif 'start' in e:
+                db.execute(
+                    "INSERT OR REPLACE INTO calendar_events VALUES (?, ?, ?, ?, ?, ?)",
+                    (calendar_id, e['id'], _event_ts(e['start']), _event_ts(e['end']),
+                     e['start'].get('dateTime', e['start'].get('date')), e.get('summary', 'Sin título'))
+                )
+        db.execute("DELETE FROM calendar_events WHERE calendar_id = ? AND fin_ts < ?",
+                   (calendar_id, day_bounds()[0].timestamp()))
+    kv_set(clave, resp.get('nextSyncToken'))
+    if not token: kv_set(clave_hasta, hasta.timestamp())
+
+def _calendars(service) -> dict:
+    """Calendarios suscritos y visibles (id -> nombre)."""
+    if CALENDAR_IDS: return {c: c for c in CALENDAR_IDS}
+    calendarios, page_token = {}, None
+    while True:
+        resp = service.calendarList().list(pageToken=page_token, fields='items(id,summary,selected),nextPageToken').execute()
+        calendarios.update({c['id']: c.get('summary', c['id']) for c in resp.get('items', []) if c.get('selected')})
+        page_token = resp.get('nextPageToken')
+        if not page_token: break
+    return calendarios or {'primary': 'primary'}
+
+def _prune_calendars(vigentes):
+    """Olvida los eventos y el estado de sincronización de los calendarios que ya no se consultan."""
+    db = _cal_db()
+    vigentes = list(vigentes)
+    marcas = ",".join("?" * len(vigentes))
+    prefijos = ('calendar.sync.', 'calendar.until.')
+    claves = [c for (c,) in db.execute("SELECT clave FROM kv WHERE clave LIKE 'calendar.%'")
+              if c.startswith(prefijos) and c.split('.', 2)[2] not in vigentes]
+    with transaction(db):
+        db.execute(f"DELETE FROM calendar_events WHERE calendar_id NOT IN ({marcas})", vigentes)
+        db.executemany("DELETE FROM kv WHERE clave = ?", [(c,) for c in claves])
+
 @tool("Calendario")
+@traced("tool:get_todays_agenda")
 def get_todays_agenda() -> str:
-    """Agenda de hoy."""
-    creds = authenticate_google()
-    if not creds: return "Error auth."
-    service = build("calendar", "v3", credentials=creds)
-    
-    now = datetime.now()
-    t_min = now.replace(hour=0, minute=0).isoformat() + 'Z'
-    t_max = now.replace(hour=23, minute=59).isoformat() + 'Z'
-    
-    events = service.events().list(calendarId='primary', timeMin=t_min, timeMax=t_max, singleEvents=True, orderBy='startTime').execute()
-    agenda = [{"titulo": e.get('summary'), "inicio": e['start'].get('dateTime')} for e in events.get('items', [])]
+    """Agenda de hoy de todos los calendarios."""
+    service = get_service("calendar", "v3")
+    if not service: return "Error auth."
+
+    calendarios = _calendars(service)
+    with ThreadPoolExecutor(max_workers=GOOGLE_WORKERS) as pool:
+        list(pool.map(propagate(lambda c: sync_calendar(service, c)), calendarios))
+    _prune_calendars(calendarios)
+
+    inicio, fin = day_bounds()
+    marcas = ",".join("?" * len(calendarios))
+    rows = _cal_db().execute(
+        "SELECT calendar_id, titulo, inicio FROM calendar_events "
+        f"WHERE inicio_ts < ? AND fin_ts > ? AND calendar_id IN ({marcas}) ORDER BY inicio_ts",
+        (fin.timestamp(), inicio.timestamp(), *calendarios)
+    ).fetchall()
+    agenda = [{"titulo": r[1], "inicio": r[2], "calendario": calendarios.get(r[0], r[0])} for r in rows]
     return json.dumps(agenda, ensure_ascii=False)
 
+def _paginate(request_fn, **params) -> list:
+    """Recorre todas las páginas de un `list` de Google Tasks."""
+    items, page_token = [], None
+    while True:
+        resp = request_fn(pageToken=page_token, **params).execute()
+        items.extend(resp.get('items', []))
+        page_token = resp.get('nextPageToken')
+        if not page_token: return items
+
+def _tasks_db():
+    db = user_db()
+    db.execute("""CREATE TABLE IF NOT EXISTS tasks (
+        list_id TEXT, task_id TEXT, titulo TEXT, due TEXT, PRIMARY KEY (list_id, task_id))""")
+    return db
+
+def _due_today(service, lista_id: str) -> list:
+    """Tareas abiertas con vencimiento hoy, filtradas en el servidor."""
+    # Tasks guarda la fecha de vencimiento como medianoche UTC del día local
+    hoy = datetime.now(ZoneInfo(TIMEZONE)).date()
+    return _paginate(
+        service.tasks().list, tasklist=lista_id, showCompleted=False, maxResults=100,
+        dueMin=f"{hoy.isoformat()}T00:00:00Z", dueMax=f"{hoy.isoformat()}T23:59:59Z",
+        fields='items(id,title,due),nextPageToken'
+    )
+
+def _sync_list(service, lista_id: str) -> list:
+    """Actualiza la caché local de una lista con updatedMin y devuelve sus tareas de hoy."""
+    db = _tasks_db()
+    clave = f'tasks.updated.{lista_id}'
+    desde = kv_get(clave)
+    ahora = datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z')
+    params = {"tasklist": lista_id, "maxResults": 100, "fields": 'items(id,title,due,status,deleted,hidden),nextPageToken'}
+    if desde:
+        params.update(updatedMin=desde, showCompleted=True, showDeleted=True, showHidden=True)
+    else:
+        params.update(showCompleted=False)
+    cambios = _paginate(service.tasks().list, **params)
+
+    with transaction(db):
+        if not desde: db.execute("DELETE FROM tasks WHERE list_id = ?", (lista_id,))
+        for t in cambios:
+            if t.get('deleted') or t.get('status') == 'completed':
+                db.execute("DELETE FROM tasks WHERE list_id = ? AND task_id = ?", (lista_id, t['id']))
+            else:
+                db.execute("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?)",
+                           (lista_id, t['id'], t.get('title', ''), t.get('due', '')))
+    kv_set(clave, ahora)
+
+    hoy_str = datetime.now(ZoneInfo(TIMEZONE)).strftime("%Y-%m-%d")
+    rows = db.execute("SELECT task_id, titulo FROM tasks WHERE list_id = ? AND due LIKE ?", (lista_id, f"{hoy_str}%")).fetchall()
+    return [{"id": r[0], "title": r[1]} for r in rows]
+
 @tool("Tareas")
+@traced("tool:get_todays_tasks")
 def get_todays_tasks() -> str:
     """Tareas para hoy."""
-    creds = authenticate_google()
-    if not creds: return "Error auth."
-    service = build("tasks", "v1", credentials=creds)
-    
-    tareas = []
-    tasklists = service.tasklists().list(maxResults=5).execute()
-    hoy_str = datetime.now().strftime("%Y-%m-%d")
-    
-    for lista in tasklists.get('items', []):
-        tasks = service.tasks().list(tasklist=lista['id'], showCompleted=False).execute()
-        for t in tasks.get('items', []):
-            if t.get('due', '').startswith(hoy_str):
-                tareas.append({"titulo": t['title'], "lista": lista['title']})
-                
-    return json.dumps(tareas, ensure_ascii=False)
\ No newline at end of file
+    service = get_service("tasks", "v1")
+    if not service: return "Error auth."
+
+    listas = _paginate(service.tasklists().list, maxResults=100, fields='items(id,title),nextPageToken')
+    fetch = _sync_list if TASKS_SYNC else _due_today
+    with ThreadPoolExecutor(max_workers=GOOGLE_WORKERS) as pool:
+        por_lista = list(pool.map(propagate(lambda l: fetch(service, l['id'])), listas))
+
+    tareas = [{"titulo": t['title'], "lista": lista['title']}
+              for lista, items in zip(listas, por_lista) for t in items]
+    return json.dumps(tareas, ensure_ascii=False)
@@ -0,0 +1,46 @@
+import asyncio
+import json
+from storage import get_db
+
+def _db():
+    db = get_db()
+    db.execute("""CREATE TABLE IF NOT EXISTS http_cache (
+        url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, valor TEXT)""")
+    return db
+
+def _lookup(url: str):
+    return _db().execute("SELECT etag, last_modified, valor FROM http_cache WHERE url = ?", (url,)).fetchone()
+
+def _store(url: str, etag: str, modified: str, valor):
+    _db().execute("INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?)",
+                  (url, etag, modified, json.dumps(valor, ensure_ascii=False)))
+
+async def acached_get(url: str, parse, **kwargs) -> tuple:
+    """GET condicional (ETag / If-Modified-Since) con el resultado ya procesado en caché.
+
+    Va por el cliente compartido de `tools.aio`; `parse` es una corrutina y solo
+    se guarda lo que devuelve (un valor JSON), no el cuerpo. Si el servidor
+    responde 304 se devuelve el valor guardado y `None` como respuesta.
+
+    SQLite va en un hilo: una consulta bloqueante pararía todo el bucle compartido.
+    """
+    from tools import aio
+
+    row = await asyncio.to_thread(_lookup, url)
+    headers = dict(kwargs.pop('headers', None) or {})
+    if row:
+        if row[0]: headers['If-None-Match'] = row[0]
+        if row[1]: headers['If-Modified-Since'] = row[1]
+
+    async def consume(resp):
+        if resp.status_code == 304 and row: return None
+        resp.raise_for_status()
+        return await parse(resp)
+
+    resp, valor = await aio.request("GET", url, consume, headers=headers, **kwargs)
+    if resp.status_code == 304 and row:
+        return json.loads(row[2]), None
+
+    etag, modified = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+    if etag or modified: await asyncio.to_thread(_store, url, etag, modified, valor)
+    return valor, resp
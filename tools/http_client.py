@@ -0,0 +1,29 @@
+"""Piezas comunes a los clientes HTTP: hooks de instrumentación y política de reintentos.
+
+Las peticiones de las herramientas van por `tools.aio` (httpx asíncrono); las
+de Google, por httplib2 (`auth._http`). Ambos publican aquí sus eventos.
+"""
+import random
+from typing import Callable, List
+from config import HTTP_BACKOFF, logger
+
+IDEMPOTENTES = {"GET", "HEAD", "OPTIONS"}
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_hooks: List[Callable[[dict], None]] = []
+
+def add_hook(fn: Callable[[dict], None]):
+    """Registra un callback que recibe un evento por cada intento HTTP (método, host, estado, tiempo, bytes)."""
+    _hooks.append(fn)
+
+def emit(evento: dict):
+    """Entrega un evento HTTP a los hooks registrados (`tools.aio` y el transporte httplib2 de Google)."""
+    for fn in _hooks:
+        try:
+            fn(evento)
+        except Exception as e:
+            logger.debug(f"Hook HTTP falló: {e}")
+
+def _backoff(intento: int) -> float:
+    """Backoff exponencial con jitter completo."""
+    return random.uniform(0, HTTP_BACKOFF * 2 ** intento)
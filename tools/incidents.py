@@ -0,0 +1,120 @@
+"""Incidencias estructuradas a partir del texto OCR del parte de transporte.
+
+El boletín se trocea en bloques (uno por aviso: empieza por "Línea..." o
+"L44", una viñeta, una mayúscula que no continúa la línea anterior o tras un
+punto final), y de cada bloque se extraen las líneas afectadas, las paradas,
+la franja horaria, las fechas y el tipo. Un índice invertido línea ->
+incidencias responde a las líneas vigiladas de cada usuario sin volver a
+recorrer el texto.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+GENERAL = "*"  # incidencias que afectan a toda la red
+SIN_LINEA = "?"  # avisos sin número de línea (p. ej. "cortes en Gran Vía por obras")
+SIN_LINEA_MAX = 5  # el boletín trae cabeceras y texto suelto: solo los primeros con tipo o parada
+
+_COD = r"[a-km-z]?\d{1,3}[a-z]?\b"  # "l12" es la línea 12, no un código con letra
+_RUTAS = re.compile(r"\b(?:lineas?|l)\s*[:#.\-]?\s*(" + _COD + r"(?:\s*(?:,|;|/|-|\by\b|\be\b)\s*" + _COD + r")*)")
+_TODAS = re.compile(r"\btodas las lineas\b|\btoda la red\b")
+_INICIO = re.compile(r"^\W*(?:lineas?|l)\s*[:#.\-]?\s*\d|^\s*[-•*·]")
+_HORA = r"(\d{1,2})(?:[:.h](\d{2}))?\s*(?:h\b|horas\b)?"
+_FRANJA = re.compile(r"\b(?:de|desde)\s+(?:las\s+)?" + _HORA + r"\s*(?:a|hasta)\s+(?:las\s+)?" + _HORA)
+_FECHAS = re.compile(r"\b(?:del|desde el)\s+(\d{1,2}(?:\s+de\s+[a-z]+)?)\s+(?:al|hasta el)\s+(\d{1,2}\s+de\s+[a-z]+)")
+_PARADAS = re.compile(r"\bparadas?\b(?:\s+(?:afectadas?|provisional(?:es)?|de|en|situada en|ubicada en|n[ºo°]\.?))*\s*:?\s+"
+                      r"(\d{3,5}\b|[^.;,(\n]{3,60}?(?=\s+(?:del?|desde|hasta|a partir)\s+\d|\s*[.;,(\n]|$))", re.IGNORECASE)
+
+# Tipo de incidencia por raíces de palabra (texto sin tildes); gana el primero que aparece en la lista
+TIPOS = [
+    ("supresión", ("suprim", "supresion", "anulad", "no prestara")),
+    ("corte", ("corte", "cortad", "cierre", "cerrad")),
+    ("desvío", ("desvi",)),
+    ("cambio de parada", ("traslad", "provisional", "reubic")),
+    ("huelga", ("huelga", "servicios minimos")),
+    ("evento", ("procesion", "desfile", "carrera", "manifestacion", "cabalgata", "fiestas")),
+    ("obras", ("obra",)),
+    ("retraso", ("retras", "demora")),
+    ("horario", ("horario", "frecuencia", "refuerzo")),
+]
+
+def _fold(texto: str) -> str:
+    """Minúsculas y sin tildes."""
+    return "".join(c for c in unicodedata.normalize("NFKD", texto.lower()) if not unicodedata.combining(c))
+
+_ENLACES = re.compile(r"(?:,|\b(?:de|del|en|la|las|el|los|y|e|a|al|por|con|entre|desde|hasta|sobre))$")
+
+def _new_sentence(anterior: str, linea: str) -> bool:
+    """Línea que empieza en mayúscula tras otra que no queda a medias ("...en" + "Gran Vía")."""
+    return linea[:1].isupper() and not _ENLACES.search(_fold(anterior))
+
+def _blocks(texto: str) -> list:
+    """Agrupa las líneas OCR en avisos: las de continuación se unen al aviso en curso."""
+    bloques = []
+    for linea in texto.splitlines():
+        linea = linea.strip()
+        if not linea: continue
+        if not bloques or _INICIO.match(_fold(linea)) or bloques[-1].endswith(".") or _new_sentence(bloques[-1], linea):
+            bloques.append(linea)
+        else:
+            bloques[-1] += " " + linea
+    return bloques
+
+def _hora(h: str, m: str):
+    return f"{int(h):02d}:{int(m or 0):02d}" if int(h) <= 24 and int(m or 0) < 60 else None
+
+def parse_block(bloque: str):
+    """Incidencia de un aviso, o None si no es un aviso (sin línea, tipo ni parada).
+
+    Los avisos sin número de línea quedan bajo SIN_LINEA: no se sabe a quién afectan.
+    """
+    plano = _fold(bloque)
+    rutas = []
+    for grupo in _RUTAS.findall(plano):
+        rutas += [c.upper() for c in re.findall(_COD, grupo)]
+    if _TODAS.search(plano): rutas.append(GENERAL)
+    tipo = next((t for t, raices in TIPOS if any(r in plano for r in raices)), None)
+    paradas = [p.strip() for p in _PARADAS.findall(bloque)]
+    if not rutas:
+        if not tipo and not paradas: return None
+        rutas = [SIN_LINEA]
+
+    incidencia = {"lineas": list(dict.fromkeys(rutas)), "tipo": tipo or "aviso"}
+    if paradas: incidencia["paradas"] = paradas
+    franja = _FRANJA.search(plano)
+    if franja:
+        desde, hasta = _hora(*franja.group(1, 2)), _hora(*franja.group(3, 4))
+        if desde and hasta: incidencia["horario"] = f"{desde}-{hasta}"
+    fechas = _FECHAS.search(plano)
+    if fechas: incidencia["fechas"] = f"{fechas.group(1)} - {fechas.group(2)}"
+    elif "hasta nuevo aviso" in plano: incidencia["fechas"] = "hasta nuevo aviso"
+    incidencia["texto"] = bloque[:200]
+    return incidencia
+
+def build_index(incidencias: list) -> dict:
+    """Índice invertido línea -> posiciones en `incidencias`."""
+    indice = defaultdict(list)
+    for i, inc in enumerate(incidencias):
+        for ruta in inc.get("lineas", []):
+            indice[ruta].append(i)
+    return dict(indice)
+
+@lru_cache(maxsize=8)
+def parse(texto: str) -> tuple:
+    """`(incidencias, índice)` de un boletín; se memoriza por texto (un boletín se parsea una vez)."""
+    incidencias, sueltas = [], 0
+    for inc in map(parse_block, _blocks(texto)):
+        if not inc: continue
+        if inc["lineas"] == [SIN_LINEA]:
+            sueltas += 1
+            if sueltas > SIN_LINEA_MAX: continue
+        incidencias.append(inc)
+    return incidencias, build_index(incidencias)
+
+def lookup(incidencias: list, indice: dict, lineas: list) -> list:
+    """Incidencias de las líneas vigiladas (y las generales y sin línea), en el orden del boletín."""
+    vigiladas = [l.strip().upper() for l in lineas if l.strip()]
+    if not vigiladas: return list(incidencias)
+    posiciones = {i for ruta in [*vigiladas, GENERAL, SIN_LINEA] for i in indice.get(ruta, [])}
+    return [incidencias[i] for i in sorted(posiciones)]
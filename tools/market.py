@@ -1,30 +1,255 @@
+import asyncio
 import json
-import requests
-import feedparser
-import yfinance as yf
-from crewai.tools import tool
-from config import CLAVES_FINANCIERAS
+import time
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dtime, timedelta
+from urllib.parse import urlencode
+from zoneinfo import ZoneInfo
+from tools import tool, aio
+from profiling import traced, propagate
+from config import CLAVES_FINANCIERAS, QUOTE_TTL, QUOTE_META_TTL, NEWS_LIMIT, NEWS_URL, logger
+from packing import compact
+from storage import get_db, transaction
+from tools.http_cache import acached_get
 
-@tool("Noticias RSS")
-def get_financial_news(busqueda: str) -> str:
-    """Busca noticias en Google News."""
-    base_url = "https://news.google.com/rss/search"
+# Horario de sesión por sufijo de símbolo (zona, apertura, cierre); sin sufijo = EE. UU.
+MERCADOS = {
+    ".MC": ("Europe/Madrid", dtime(9, 0), dtime(17, 35)),
+    ".PA": ("Europe/Paris", dtime(9, 0), dtime(17, 35)),
+    ".DE": ("Europe/Berlin", dtime(9, 0), dtime(17, 35)),
+    ".AS": ("Europe/Amsterdam", dtime(9, 0), dtime(17, 35)),
+    ".MI": ("Europe/Rome", dtime(9, 0), dtime(17, 35)),
+    ".L": ("Europe/London", dtime(8, 0), dtime(16, 35)),
+    "": ("America/New_York", dtime(9, 30), dtime(16, 0)),
+}
+
+_memoria = {}
+_memoria_lock = threading.Lock()
+
+# yfinance arrastra pandas y numpy: se importa la primera vez que hace falta
+yf = None
+
+def _yf():
+    global yf
+    if yf is None:
+        import yfinance
+        yf = yfinance
+    return yf
+
+def _mercado(symbol: str) -> tuple:
+    sufijo = symbol[symbol.rfind('.'):] if '.' in symbol else ""
+    return MERCADOS.get(sufijo, MERCADOS[""])
+
+def _expiracion(symbol: str, ahora: float = None) -> float:
+    """Hasta cuándo vale una cotización: QUOTE_TTL en sesión; si no, hasta la próxima apertura."""
+    zona, apertura, cierre = _mercado(symbol)
+    tz = ZoneInfo(zona)
+    now = datetime.fromtimestamp(ahora or time.time(), tz)
+    if now.weekday() < 5 and apertura <= now.time() < cierre:
+        return now.timestamp() + QUOTE_TTL
+    for dias in range(8):
+        dia = now.date() + timedelta(days=dias)
+        inicio = datetime.combine(dia, apertura, tzinfo=tz)
+        if dia.weekday() < 5 and inicio > now: return inicio.timestamp()
+    return now.timestamp() + QUOTE_TTL
+
+def _db():
+    db = get_db()
+    db.execute("CREATE TABLE IF NOT EXISTS quotes (symbol TEXT PRIMARY KEY, expira REAL, datos TEXT)")
+    db.execute("CREATE TABLE IF NOT EXISTS quote_meta (symbol TEXT PRIMARY KEY, expira REAL, datos TEXT)")
+    return db
+
+def _cached(tabla: str, symbols: list) -> dict:
+    """Entradas vigentes en disco: símbolo -> (expira, datos)."""
+    if not symbols: return {}
+    rows = _db().execute(
+        f"SELECT symbol, expira, datos FROM {tabla} WHERE expira > ? AND symbol IN ({','.join('?' * len(symbols))})",
+        [time.time(), *symbols]
+    ).fetchall()
+    return {s: (e, json.loads(d)) for s, e, d in rows}
+
+def _store(tabla: str, valores: dict, expira):
+    with transaction() as db:
+        db.executemany(f"INSERT OR REPLACE INTO {tabla} VALUES (?, ?, ?)",
+                       [(s, expira(s), json.dumps(d, ensure_ascii=False)) for s, d in valores.items()])
+
+def _metadata(symbols: list) -> dict:
+    """Nombre, divisa, bolsa y acciones en circulación; cambian poco y se cachean una semana."""
+    meta = {s: d for s, (_, d) in _cached("quote_meta", symbols).items()}
+    faltan = [s for s in symbols if s not in meta]
+
+    def _info(s):
+        try:
+            info = _yf().Ticker(s).info or {}
+        except Exception as e:
+            logger.warning(f"⚠️ Sin metadatos para {s}: {e}")
+            return s, {}
+        return s, {k: info.get(k) for k in ("symbol", "shortName", "currency", "exchange", "sharesOutstanding") if info.get(k) is not None}
+
+    if faltan:
+        with ThreadPoolExecutor(max_workers=min(8, len(faltan))) as pool:
+            nuevos = {s: d for s, d in pool.map(propagate(_info), faltan) if d}
+        _store("quote_meta", nuevos, lambda s: time.time() + QUOTE_META_TTL)
+        meta.update(nuevos)
+    return meta
+
+def _prices(symbols: list) -> dict:
+    """Precios de todos los símbolos en una única descarga del histórico diario de un año."""
+    df = _yf().download(symbols, period="1y", interval="1d", group_by="ticker",
+                     auto_adjust=False, progress=False, threads=True)
+    precios = {}
+    for s in symbols:
+        try:
+            h = (df[s] if df.columns.nlevels > 1 else df).dropna(subset=["Close"])
+        except KeyError:
+            continue
+        if h.empty: continue
+        ultimo = h.iloc[-1]
+        anterior = h["Close"].iloc[-2] if len(h) > 1 else None
+        datos = {
+            "currentPrice": float(ultimo["Close"]),
+            "regularMarketPrice": float(ultimo["Close"]),
+            "dayLow": float(ultimo["Low"]),
+            "dayHigh": float(ultimo["High"]),
+            "fiftyTwoWeekLow": float(h["Low"].min()),
+            "fiftyTwoWeekHigh": float(h["High"].max()),
+        }
+        if anterior:
+            datos["previousClose"] = float(anterior)
+            datos["regularMarketChangePercent"] = round((ultimo["Close"] / anterior - 1) * 100, 4)
+        precios[s] = datos
+    return precios
+
+def get_quotes(symbols: list) -> dict:
+    """Cotizaciones de varios símbolos con caché en memoria y en disco según horario de mercado.
+
+    Solo se va a la red por los símbolos cuya cotización puede haber cambiado
+    desde la última consulta, y para todos ellos a la vez.
+    """
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+    ahora = time.time()
+    with _memoria_lock:
+        vigentes = {s: e for s, e in _memoria.items() if s in symbols and e[0] > ahora}
+    leidas = _cached("quotes", [s for s in symbols if s not in vigentes])
+    vigentes.update(leidas)
+    resultado = {s: d for s, (_, d) in vigentes.items()}
+
+    faltan = [s for s in symbols if s not in resultado]
+    if faltan:
+        precios = _prices(faltan)
+        meta = _metadata(list(precios))
+        nuevos = {}
+        for s, p in precios.items():
+            m = meta.get(s, {})
+            datos = {"symbol": s, **{k: v for k, v in m.items() if k != "sharesOutstanding"}, **p}
+            if m.get("sharesOutstanding"): datos["marketCap"] = int(m["sharesOutstanding"] * p["currentPrice"])
+            nuevos[s] = {k: datos[k] for k in CLAVES_FINANCIERAS if datos.get(k) is not None}
+        expira = {s: _expiracion(s, ahora) for s in nuevos}
+        _store("quotes", nuevos, expira.get)
+        leidas.update({s: (expira[s], d) for s, d in nuevos.items()})
+        resultado.update(nuevos)
+
+    # A memoria con la expiración de disco: renovarla alargaría la vida de una cotización vieja
+    with _memoria_lock:
+        _memoria.update(leidas)
+    return {s: resultado[s] for s in symbols if s in resultado}
+
+async def _parse_items(resp, limite: int = NEWS_LIMIT) -> list:
+    """Parsea el RSS en streaming y deja de leer al llegar a `limite` noticias."""
+    parser = ET.XMLPullParser(events=("end",))
+    noticias, leido = [], []
+    trozos = resp.aiter_bytes()
+    try:
+        async for chunk in trozos:
+            leido.append(chunk)
+            parser.feed(chunk)
+            for _, elem in parser.read_events():
+                if elem.tag != "item": continue
+                noticias.append({"titulo": elem.findtext("title", ""), "link": elem.findtext("link", "")})
+                if len(noticias) >= limite: return noticias
+        return noticias
+    except ET.ParseError:
+        # XML no estricto: feedparser es más tolerante
+        import feedparser
+        leido += [chunk async for chunk in trozos]
+        f = feedparser.parse(b"".join(leido))
+        return [{"titulo": e.title, "link": e.link} for e in f.entries[:limite]]
+
+async def _fetch_feed(busqueda: str) -> list:
     params = {"q": busqueda, "hl": "es-ES", "gl": "ES", "ceid": "ES:es"}
-    headers = {"User-Agent": "Mozilla/5.0"}
-    
+    url = f"{NEWS_URL}?{urlencode(params)}"
+    noticias, _ = await acached_get(url, _parse_items, timeout=10)
+    return noticias
+
+async def afetch_news(busquedas: list) -> dict:
+    """Noticias de varias búsquedas a la vez sobre el cliente asíncrono compartido, con caché condicional."""
+    busquedas = list(dict.fromkeys(b.strip() for b in busquedas if b.strip()))
+    resultados = await asyncio.gather(*(_fetch_feed(b) for b in busquedas), return_exceptions=True)
+    return {b: {"error": str(r)} if isinstance(r, Exception) else r for b, r in zip(busquedas, resultados)}
+
+def fetch_news(busquedas: list) -> dict:
+    return aio.run(afetch_news(busquedas))
+
+async def aget_financial_news(busqueda: str) -> str:
     try:
-        resp = requests.get(base_url, params=params, headers=headers, timeout=10)
-        f = feedparser.parse(resp.content)
-        noticias = [{"titulo": e.title, "link": e.link} for e in f.entries[:5]]
+        noticias = await afetch_news(busqueda.split(';'))
+        if len(noticias) == 1:
+            return json.dumps({"news": next(iter(noticias.values()))}, ensure_ascii=False)
         return json.dumps({"news": noticias}, ensure_ascii=False)
     except Exception as e: return json.dumps({"error": str(e)})
 
+@tool("Noticias RSS")
+@traced("tool:get_financial_news")
+def get_financial_news(busqueda: str) -> str:
+    """Busca noticias en Google News. Acepta varias búsquedas separadas por ';'."""
+    return aio.run(aget_financial_news(busqueda))
+
+async def aget_stock_price(symbol: str) -> str:
+    """Versión asíncrona de `get_stock_price`.
+
+    yfinance no tiene API asíncrona: la descarga (una sola para todos los
+    símbolos) corre en un hilo para no bloquear el bucle compartido.
+    """
+    return await asyncio.to_thread(get_stock_price.fn, symbol)
+
 @tool("Bolsa")
+@traced("tool:get_stock_price")
 def get_stock_price(symbol: str) -> str:
-    """Obtiene datos de Yahoo Finance."""
+    """Obtiene datos de Yahoo Finance. Acepta varios símbolos separados por comas."""
+    try:
+        symbols = symbol.split(',')
+        quotes = get_quotes(symbols)
+        if len(symbols) == 1:
+            return compact({"stock": next(iter(quotes.values()), {})})
+        return compact({"stocks": list(quotes.values())})
+    except Exception as e: return json.dumps({"error": str(e)})
+
+def select_quotes(raw: str, symbols: list) -> str:
+    """Recorta la salida de `get_stock_price` a `symbols` (modo multiusuario: una consulta, varios usuarios)."""
+    try:
+        datos = json.loads(raw)
+    except ValueError:
+        return raw
+    if "error" in datos: return raw
+    todas = {q.get("symbol"): q for q in ([datos["stock"]] if "stock" in datos else datos.get("stocks", []))}
+    symbols = [s.strip().upper() for s in symbols if s.strip()]
+    if len(symbols) == 1: return compact({"stock": todas.get(symbols[0], {})})
+    return compact({"stocks": [todas[s] for s in symbols if s in todas]})
+
+def select_news(raw: str, busquedas: list) -> str:
+    """Recorta la salida de `get_financial_news` a `busquedas`."""
     try:
-        t = yf.Ticker(symbol.strip().upper())
-        info = t.info
-        datos = {k: info.get(k) for k in CLAVES_FINANCIERAS if info.get(k) is not None}
-        return json.dumps({"stock": datos}, indent=2, ensure_ascii=False)
-    except Exception as e: return json.dumps({"error": str(e)})
\ No newline at end of file
+        datos = json.loads(raw)
+    except ValueError:
+        return raw
+    if "error" in datos: return raw
+    busquedas = list(dict.fromkeys(b.strip() for b in busquedas if b.strip()))
+    noticias = datos.get("news")
+    # Con una sola búsqueda en el lote la salida no va indexada por búsqueda
+    if not isinstance(noticias, dict): return raw
+    elegidas = {b: noticias[b] for b in busquedas if b in noticias}
+    if len(elegidas) == 1:
+        return json.dumps({"news": next(iter(elegidas.values()))}, ensure_ascii=False)
+    return json.dumps({"news": elegidas}, ensure_ascii=False)
@@ -1,50 +1,251 @@
 import os
-import requests
-import json
-from crewai.tools import tool
-from twilio.rest import Client
-from config import DRY_RUN
+import asyncio
+import hashlib
+import time
+from functools import lru_cache
+from tools import tool, aio
+from profiling import profiler, traced
+from config import DRY_RUN, TELEGRAM_API, DELIVERY_RETRIES, DELIVERY_DEDUPE_TTL, logger
+from storage import get_db
+from tools.http_client import _backoff
+from users import setting, current_user
+
+# Longitud máxima de un mensaje por canal
+LIMITES = {"telegram": 4096, "whatsapp": 1600, "pushover": 1024}
+
+class _Transitorio(Exception):
+    """Respuesta que merece reintento (429, 5xx); `espera` es el Retry-After si lo hay."""
+
+    def __init__(self, msg: str, espera: float = None):
+        super().__init__(msg)
+        self.espera = espera
+
+class _Incierto(Exception):
+    """El servicio pudo recibir el mensaje (timeout o corte tras enviarlo): no se reenvía."""
+
+@lru_cache(maxsize=4)
+def _twilio(sid: str, token: str):
+    """Cliente Twilio reutilizado entre envíos (mantiene su sesión HTTP abierta)."""
+    from twilio.rest import Client
+    return Client(sid, token)
+
+def split_message(texto: str, limite: int) -> list:
+    """Trocea un mensaje largo por secciones (párrafos), luego por líneas y, como último recurso, por caracteres."""
+    partes, actual = [], ""
+
+    def añadir(bloque: str, sep: str) -> bool:
+        """Añade a la parte en curso o, si no cabe, empieza una nueva; False si ni así cabe."""
+        nonlocal actual
+        if actual and len(actual) + len(sep) + len(bloque) <= limite:
+            actual += sep + bloque
+            return True
+        if actual: partes.append(actual)
+        actual = bloque if len(bloque) <= limite else ""
+        return len(bloque) <= limite
+
+    for seccion in texto.split("\n\n"):
+        if añadir(seccion, "\n\n"): continue
+        for j, linea in enumerate(seccion.split("\n")):
+            if añadir(linea, "\n" if j else "\n\n"): continue
+            for i in range(0, len(linea), limite):
+                añadir(linea[i:i + limite], "")
+    if actual: partes.append(actual)
+    return partes or [""]
+
+# --- Envío de una parte por canal (lanzan excepción si el servicio no la acepta) ---
+
+def _check(resp, canal: str) -> dict:
+    """Valida la respuesta HTTP: 429/5xx son transitorios, el resto de errores definitivos."""
+    try:
+        cuerpo = resp.json()
+    except ValueError:
+        cuerpo = {}
+    if resp.status_code == 429 or resp.status_code >= 500:
+        espera = resp.headers.get("Retry-After") or (cuerpo.get("parameters") or {}).get("retry_after")
+        raise _Transitorio(f"{canal} HTTP {resp.status_code}", float(espera) if espera else None)
+    if resp.status_code != 200:
+        detalle = cuerpo.get("description") or cuerpo.get("errors") or resp.text[:200]
+        raise RuntimeError(f"{canal} HTTP {resp.status_code}: {detalle}")
+    return cuerpo
+
+async def _telegram(destino: str, texto: str):
+    url = f"{TELEGRAM_API}/bot{os.environ.get('TELEGRAM_TOKEN')}/sendMessage"
+    payload = {"chat_id": destino, "text": texto, "parse_mode": "Markdown"}
+    try:
+        cuerpo = _check((await aio.request("POST", url, json=payload, timeout=10))[0], "Telegram")
+    except RuntimeError as e:
+        # Markdown roto (p. ej. una entidad partida al trocear): se reenvía como texto plano
+        if "parse entities" not in str(e): raise
+        payload.pop("parse_mode")
+        cuerpo = _check((await aio.request("POST", url, json=payload, timeout=10))[0], "Telegram")
+    if not cuerpo.get("ok"): raise RuntimeError(f"Telegram: {cuerpo.get('description')}")
+
+async def _pushover(destino: str, texto: str):
+    if DRY_RUN: return
+    resp, _ = await aio.request("POST", "https://api.pushover.net/1/messages.json",
+                                data={"token": os.environ.get("PUSHOVER_TOKEN"), "user": destino, "message": texto},
+                                timeout=10)
+    cuerpo = _check(resp, "Pushover")
+    if cuerpo.get("status") != 1: raise RuntimeError(f"Pushover: {cuerpo.get('errors')}")
+
+async def _whatsapp(destino: str, texto: str):
+    if DRY_RUN: return
+    from twilio.base.exceptions import TwilioRestException
+
+    client = _twilio(os.environ.get("TWILIO_ACCOUNT_SID"), os.environ.get("TWILIO_AUTH_TOKEN"))
+    try:
+        # El cliente de Twilio es síncrono: en un hilo para no bloquear el bucle
+        await asyncio.to_thread(client.messages.create, body=texto,
+                                from_=os.environ.get("TWILIO_FROM_NUMBER"), to=destino)
+    except TwilioRestException as e:
+        if e.status == 429 or e.status >= 500: raise _Transitorio(f"WhatsApp HTTP {e.status}")
+        raise
+
+ENVIOS = {"telegram": _telegram, "pushover": _pushover, "whatsapp": _whatsapp}
+
+def destinations() -> dict:
+    """Canales con credenciales para el usuario actual y su destinatario."""
+    destinos = {
+        "telegram": os.environ.get("TELEGRAM_TOKEN") and setting("telegram_chat_id", os.environ.get("TELEGRAM_CHAT_ID")),
+        "pushover": os.environ.get("PUSHOVER_TOKEN") and setting("pushover_user", os.environ.get("PUSHOVER_USER")),
+        "whatsapp": all(os.environ.get(k) for k in ("TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN", "TWILIO_FROM_NUMBER"))
+                    and setting("whatsapp_phone", os.environ.get("WHATSAPP_PHONE")),
+    }
+    return {canal: destino for canal, destino in destinos.items() if destino}
+
+# --- Deduplicación ---
+
+def _db():
+    db = get_db()
+    db.execute("""CREATE TABLE IF NOT EXISTS deliveries (
+        canal TEXT, destino TEXT, hash TEXT, enviado REAL, PRIMARY KEY (canal, destino, hash))""")
+    return db
+
+def _sent(canal: str, destino: str, clave: str) -> bool:
+    if not DELIVERY_DEDUPE_TTL: return False
+    return _db().execute("SELECT 1 FROM deliveries WHERE canal = ? AND destino = ? AND hash = ? AND enviado > ?",
+                         (canal, destino, clave, time.time() - DELIVERY_DEDUPE_TTL)).fetchone() is not None
+
+def _mark_sent(canal: str, destino: str, clave: str):
+    if not DELIVERY_DEDUPE_TTL or DRY_RUN: return  # en simulación no cuenta como entregado
+    db = _db()
+    db.execute("INSERT OR REPLACE INTO deliveries VALUES (?, ?, ?, ?)", (canal, destino, clave, time.time()))
+    db.execute("DELETE FROM deliveries WHERE enviado < ?", (time.time() - DELIVERY_DEDUPE_TTL,))
+
+# --- Entrega ---
+
+ENTREGADO = ("enviado", "duplicado")
+_entregas = {}  # id de usuario (None sin registro) -> hora de la última entrega por algún canal
+
+def delivered_since(inicio: float) -> bool:
+    """Si algún canal entregó un briefing del usuario actual desde `inicio` (vale también para el modo crew)."""
+    return _entregas.get((current_user() or {}).get("id"), 0) >= inicio
+
+def _before_send(e: Exception) -> bool:
+    """Fallo de red antes de que el servicio reciba nada (conexión o pool): reintentar no duplica."""
+    import httpx
+    import requests
+
+    return isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, requests.ConnectTimeout))
+
+async def _retry(fn, *args):
+    """Reintenta los fallos transitorios con backoff exponencial (o el Retry-After del servicio).
+
+    Solo se reintenta lo que seguro no llegó: errores de conexión y respuestas
+    429/5xx. Un timeout de lectura (el servicio pudo aceptar el mensaje) se
+    convierte en `_Incierto` y no se reenvía.
+    """
+    import httpx
+    import requests
+
+    for intento in range(DELIVERY_RETRIES + 1):
+        try:
+            return await fn(*args)
+        except Exception as e:
+            if not (isinstance(e, _Transitorio) or _before_send(e)):
+                if isinstance(e, (httpx.TransportError, requests.RequestException)):
+                    raise _Incierto(str(e) or type(e).__name__) from e
+                raise
+            if intento == DELIVERY_RETRIES: raise
+            espera = getattr(e, "espera", None)
+            logger.warning(f"⚠️ {e or type(e).__name__}; reintento {intento + 1}/{DELIVERY_RETRIES}.")
+            await asyncio.sleep(espera if espera is not None else _backoff(intento))
+
+async def _deliver(canal: str, destino: str, texto: str) -> dict:
+    """Envía `texto` por un canal, troceado a su límite y en orden.
+
+    Cada parte se identifica por el hash del mensaje completo y su posición: al
+    repetir un envío solo salen las partes que no llegaron la otra vez.
+    """
+    t0 = time.perf_counter()
+    partes = split_message(texto, LIMITES[canal])
+    digest = hashlib.sha256(texto.encode()).hexdigest()
+    resultado = {"canal": canal, "partes": len(partes), "enviadas": 0, "duplicadas": 0, "inciertas": 0}
+    with profiler.span(f"deliver:{canal}", "entrega"):
+        try:
+            for i, parte in enumerate(partes):
+                clave = f"{digest}:{i}"
+                if await asyncio.to_thread(_sent, canal, destino, clave):
+                    resultado["duplicadas"] += 1
+                    continue
+                try:
+                    await _retry(ENVIOS[canal], destino, parte)
+                    resultado["enviadas"] += 1
+                except _Incierto as e:
+                    # Se da por enviada: repetirla podría duplicar el mensaje
+                    logger.warning(f"⚠️ {canal}: sin confirmación de la parte {i + 1}/{len(partes)} ({e}); no se reenvía.")
+                    resultado["inciertas"] += 1
+                await asyncio.to_thread(_mark_sent, canal, destino, clave)
+            if resultado["inciertas"]: resultado["estado"] = "sin confirmar"
+            elif resultado["duplicadas"] == len(partes): resultado["estado"] = "duplicado"
+            else: resultado["estado"] = "simulado" if DRY_RUN else "enviado"  # en simulación no cuenta como entrega
+            if resultado["estado"] in ENTREGADO: _entregas[(current_user() or {}).get("id")] = time.time()
+        except Exception as e:
+            resultado["estado"] = f"error: {e}"
+    resultado["segundos"] = round(time.perf_counter() - t0, 3)
+    return resultado
+
+async def abroadcast(texto: str, canales: list = None) -> list:
+    """Envía `texto` por todos los canales configurados a la vez.
+
+    El tiempo total es el del canal más lento. Devuelve un resultado por canal
+    (estado, partes enviadas o ya entregadas antes, segundos).
+    """
+    destinos = destinations()
+    if canales is not None: destinos = {c: d for c, d in destinos.items() if c in canales}
+    return list(await asyncio.gather(*(_deliver(canal, destino, texto) for canal, destino in destinos.items())))
+
+def broadcast(texto: str, canales: list = None) -> list:
+    return aio.run(abroadcast(texto, canales))
+
+def _summary(resultado: dict) -> str:
+    return (f"{resultado['canal']}: {resultado['estado']} ({resultado['enviadas']}/{resultado['partes']} partes, "
+            f"{resultado['segundos']:.2f}s)")
+
+def _one(canal: str, texto: str) -> str:
+    resultados = broadcast(texto, [canal])
+    return _summary(resultados[0]) if resultados else f"Faltan credenciales de {canal}."
+
+@tool("Enviar briefing")
+@traced("tool:send_briefing")
+def send_briefing(message: str) -> str:
+    """Envía el briefing por todos los canales configurados (Telegram, Pushover, WhatsApp) a la vez."""
+    return "\n".join(_summary(r) for r in broadcast(message)) or "No hay canales configurados."
 
 @tool("Enviar Telegram")
+@traced("tool:send_telegram")
 def send_telegram(message: str) -> str:
     """Envía mensaje a Telegram."""
-    token = os.environ.get("TELEGRAM_TOKEN")
-    chat_id = os.environ.get("TELEGRAM_CHAT_ID")
-    if not token or not chat_id: return "Error credenciales Telegram."
-    
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {"chat_id": chat_id, "text": message, "parse_mode": "Markdown"}
-    try:
-        requests.post(url, json=payload, timeout=10)
-        return "Telegram enviado."
-    except Exception as e: return f"Error Telegram: {e}"
+    return _one("telegram", message)
 
 @tool("Enviar Pushover")
+@traced("tool:send_pushover")
 def send_pushover(msg: str) -> str:
     """Envía notificación Pushover."""
-    if DRY_RUN: return "Simulación Pushover enviada."
-    user = os.environ.get("PUSHOVER_USER")
-    token = os.environ.get("PUSHOVER_TOKEN")
-    
-    try:
-        requests.post("https://api.pushover.net/1/messages.json",
-                      data={"token": token, "user": user, "message": msg}, timeout=10)
-        return "Pushover enviado."
-    except Exception as e: return f"Error Pushover: {e}"
+    return _one("pushover", msg)
 
 @tool("Enviar WhatsApp")
+@traced("tool:send_whatsapp")
 def send_whatsapp(message: str) -> str:
     """Envía WhatsApp vía Twilio."""
-    if DRY_RUN: return "Simulación WhatsApp enviada."
-    sid = os.environ.get("TWILIO_ACCOUNT_SID")
-    token = os.environ.get("TWILIO_AUTH_TOKEN")
-    from_num = os.environ.get("TWILIO_FROM_NUMBER")
-    to_num = os.environ.get("WHATSAPP_PHONE")
-    
-    if not all([sid, token, from_num, to_num]): return "Faltan credenciales Twilio."
-    
-    try:
-        client = Client(sid, token)
-        msg = client.messages.create(body=message[:1500], from_=from_num, to=to_num)
-        return f"WhatsApp enviado ID: {msg.sid}"
-    except Exception as e: return f"Error WhatsApp: {e}"
\ No newline at end of file
+    return _one("whatsapp", message)
@@ -0,0 +1,77 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import List
+from PIL import Image, ImageOps
+from config import OCR_WORKERS, OCR_MAX_SIDE, OCR_LANGS, logger
+
+try:
+    import tesserocr
+except ImportError:  # Sin tesserocr se usa pytesseract (un subproceso por imagen)
+    tesserocr = None
+    import pytesseract
+
+_local = threading.local()
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_api():
+    """Handle de Tesseract caliente en este hilo (primer idioma disponible de OCR_LANGS).
+
+    Un PyTessBaseAPI no es seguro entre hilos (`asyncio.to_thread`, precarga y
+    briefing del daemon): cada hilo tiene el suyo.
+    """
+    api = getattr(_local, "api", None)
+    if api is None:
+        disponibles = set(tesserocr.get_languages()[1])
+        lang = next((l for l in OCR_LANGS if l in disponibles), 'eng')
+        api = _local.api = tesserocr.PyTessBaseAPI(lang=lang, psm=tesserocr.PSM.AUTO)
+    return api
+
+def preprocess(data: bytes) -> Image.Image:
+    """Reduce, pasa a escala de grises, binariza y recorta márgenes en blanco."""
+    img = Image.open(BytesIO(data))
+    if img.format == 'JPEG':
+        # draft decodifica directamente a escala reducida (1/2, 1/4, 1/8) y en gris
+        img.draft('L', (OCR_MAX_SIDE, OCR_MAX_SIDE))
+    img = img.convert('L')
+    if max(img.size) > OCR_MAX_SIDE:
+        img.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.LANCZOS)
+
+    img = ImageOps.autocontrast(img)
+    img = img.point(lambda p: 255 if p > 160 else 0, mode='1')
+    bbox = ImageOps.invert(img.convert('L')).getbbox()
+    if bbox: img = img.crop(bbox)
+    return img
+
+def ocr_image(data: bytes) -> str:
+    """OCR de una imagen en el proceso actual."""
+    img = preprocess(data)
+    if tesserocr:
+        api = _get_api()
+        api.SetImage(img)
+        return api.GetUTF8Text()
+
+    for lang in OCR_LANGS:
+        try:
+            return pytesseract.image_to_string(img, lang=lang)
+        except pytesseract.TesseractError as e:
+            logger.warning(f"⚠️ OCR '{lang}' falló: {e}")
+    return pytesseract.image_to_string(img)
+
+def _warm():
+    if tesserocr: _get_api()
+
+def ocr_many(images: List[bytes]) -> List[str]:
+    """OCR de varias imágenes en paralelo sobre un pool de procesos con Tesseract caliente."""
+    if len(images) <= 1 or OCR_WORKERS <= 1:
+        return [ocr_image(d) for d in images]
+
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: el proceso padre tiene hilos (recolector) y fork no es seguro con ellos
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=_warm,
+                                        mp_context=multiprocessing.get_context('spawn'))
+    return list(_pool.map(ocr_image, images))
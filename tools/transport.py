@@ -1,50 +1,135 @@
-import requests
-from io import BytesIO
-from bs4 import BeautifulSoup
-from PIL import Image
-import pytesseract
-from urllib.parse import urlparse
-from crewai.tools import tool
+import asyncio
+import hashlib
+import json
+from html.parser import HTMLParser
+from urllib.parse import urlparse, urljoin, parse_qs
+from tools import tool, aio, incidents
+from profiling import traced
+from config import TRANSPORT_URL, TRANSPORT_MAX_INCIDENTS, logger
+from packing import compact
+from storage import get_db
+from tools.http_cache import acached_get
 
-@tool("Transporte")
-def inc_transport():
-    """OCR para incidencias de transporte."""
-    URL = 'https://tmpmurcia.es/ultima.asp'
+URL = TRANSPORT_URL
+
+class _Found(Exception):
+    pass
+
+class _TagAttrs(HTMLParser):
+    """Recoge el atributo de las etiquetas que cumplen el criterio; con `first` se detiene en la primera."""
+
+    def __init__(self, tag: str, attr: str, needle: str, first: bool):
+        super().__init__()
+        self.tag, self.attr, self.needle, self.first = tag, attr, needle, first
+        self.valores = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != self.tag: return
+        valor = dict(attrs).get(self.attr) or ''
+        if self.needle in valor and valor not in self.valores:
+            self.valores.append(valor)
+            if self.first: raise _Found()
+
+async def _scan(resp, tag: str, attr: str, needle: str, first: bool = False) -> list:
+    """Lee el HTML en streaming; con `first` deja de descargar en cuanto aparece la etiqueta."""
+    parser = _TagAttrs(tag, attr, needle, first)
+    if not resp.charset_encoding: resp.encoding = 'latin-1'
+    try:
+        async for chunk in resp.aiter_text():
+            parser.feed(chunk)
+    except _Found:
+        pass
+    return parser.valores
+
+async def _digest(resp) -> str:
+    return hashlib.sha256(await resp.aread()).hexdigest()
+
+def _clean_ocr(texto: str) -> str:
+    """Quita líneas vacías y ruido de OCR (líneas con menos de 3 letras o dígitos)."""
+    lineas = (" ".join(l.split()) for l in texto.splitlines())
+    return "\n".join(l for l in lineas if sum(c.isalnum() for c in l) >= 3)
+
+def _affected(incidencias: list, indice: dict, lineas: str) -> dict:
+    """Incidencias de las líneas vigiladas (separadas por comas) y las demás líneas afectadas, sin detalle.
+
+    Sin líneas vigiladas van las TRANSPORT_MAX_INCIDENTS primeras y del resto solo sus líneas.
+    """
+    vigiladas = {l.strip().upper() for l in lineas.split(',') if l.strip()}
+    if vigiladas:
+        propias = incidents.lookup(incidencias, indice, vigiladas)
+    else:
+        propias = incidencias[:TRANSPORT_MAX_INCIDENTS]
+        vigiladas = {r for inc in propias for r in inc.get("lineas", [])}
+    return {"incidencias": propias,
+            "otras_lineas": sorted(set(indice) - vigiladas - {incidents.GENERAL, incidents.SIN_LINEA})}
+
+def _ocr_db():
+    db = get_db()
+    db.execute("""CREATE TABLE IF NOT EXISTS transport_ocr (
+        codigo TEXT, img_hash TEXT, texto TEXT, PRIMARY KEY (codigo, img_hash))""")
+    return db
+
+# SQLite fuera del bucle compartido (asyncio.to_thread)
+def _ocr_get(codigo: str, img_hash: str):
+    return _ocr_db().execute("SELECT texto FROM transport_ocr WHERE codigo = ? AND img_hash = ?",
+                             (codigo, img_hash)).fetchone()
+
+def _ocr_put(codigo: str, img_hash: str, texto: str):
+    _ocr_db().execute("INSERT OR REPLACE INTO transport_ocr VALUES (?, ?, ?)", (codigo, img_hash, texto))
+
+async def ainc_transport(lineas: str = "") -> str:
+    """Versión asíncrona de `inc_transport`: las imágenes del boletín se descargan a la vez."""
     try:
-        resp = requests.get(URL, timeout=15)
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        
-        # Buscar enlace del día
-        enlace = None
         parsed = urlparse(URL)
         base = f"{parsed.scheme}://{parsed.netloc}/"
-        for a in soup.find_all('a', href=True):
-            if "Cuerpo.asp?codigo=" in a['href']:
-                enlace = base + a['href']
-                break
-        
-        if not enlace: return "No hay parte diario."
-        
-        # Buscar imagen
-        r = requests.get(enlace, timeout=15)
-        sub_soup = BeautifulSoup(r.text, 'html.parser')
-        img_tag = sub_soup.find('img', src=lambda x: x and '/fotos/noticias/' in x)
-        
-        if not img_tag: return "No imagen encontrada."
-        
-        img_url = img_tag['src']
-        if not img_url.startswith('http'): img_url = f"https://tmpmurcia.es/{img_url.lstrip('/')}"
-        
-        # OCR
-        img_data = requests.get(img_url, timeout=15).content
-        imagen = Image.open(BytesIO(img_data))
-        
-        # Intento robusto de OCR (Español -> Inglés fallback)
-        try:
-            texto = pytesseract.image_to_string(imagen, lang='spa')
-        except:
-            texto = pytesseract.image_to_string(imagen, lang='eng')
-            
-        return {"texto": texto[:600], "enlace": enlace}
-        
-    except Exception as e: return f"Error transporte: {e}"
\ No newline at end of file
+
+        # Buscar enlace del día
+        hrefs, _ = await acached_get(URL, lambda r: _scan(r, 'a', 'href', "Cuerpo.asp?codigo=", first=True), timeout=15)
+        if not hrefs: return "No hay parte diario."
+        enlace = base + hrefs[0]
+        codigo = parse_qs(urlparse(enlace).query).get('codigo', [hrefs[0]])[0]
+
+        # Buscar todas las imágenes del boletín
+        srcs, _ = await acached_get(enlace, lambda r: _scan(r, 'img', 'src', '/fotos/noticias/'), timeout=15)
+        if not srcs: return "No imagen encontrada."
+        img_urls = [s if s.startswith('http') else urljoin(base, s.lstrip('/')) for s in srcs]
+
+        # Las imágenes solo se descargan si cambiaron; los hashes identifican el boletín ya leído
+        descargas = await asyncio.gather(*(acached_get(u, _digest, timeout=15) for u in img_urls))
+        img_hash = hashlib.sha256("".join(h for h, _ in descargas).encode()).hexdigest()
+        row = await asyncio.to_thread(_ocr_get, codigo, img_hash)
+        if row:
+            logger.info(f"♻️ Boletín {codigo} sin cambios: se reutiliza el OCR.")
+            texto = row[0]
+        else:
+            from tools.ocr import ocr_many  # Pillow y tesseract solo si hay boletín nuevo
+            # Una imagen servida desde caché (304) hay que descargarla para el OCR
+            faltan = [u for u, (_, r) in zip(img_urls, descargas) if r is None]
+            bajadas = dict(zip(faltan, await asyncio.gather(*(aio.get(u, timeout=15) for u in faltan))))
+            datos = [(r if r is not None else bajadas[u]).content for u, (_, r) in zip(img_urls, descargas)]
+            texto = "\n\n".join(await asyncio.to_thread(ocr_many, datos))
+            await asyncio.to_thread(_ocr_put, codigo, img_hash, texto)
+
+        # Al LLM solo llegan las incidencias estructuradas de sus líneas, no el texto OCR
+        incidencias, indice = incidents.parse(_clean_ocr(texto))
+        return compact({**_affected(incidencias, indice, lineas), "enlace": enlace})
+
+    except Exception as e: return f"Error transporte: {e}"
+
+@tool("Transporte")
+@traced("tool:inc_transport")
+def inc_transport(lineas: str = "") -> str:
+    """Incidencias del parte diario de transporte (OCR) por línea. `lineas`: líneas vigiladas separadas por comas."""
+    return aio.run(ainc_transport(lineas))
+
+def select_lines(raw: str, lineas: str) -> str:
+    """Filtra la salida de `inc_transport` (pedida con la unión de líneas) para otras líneas vigiladas."""
+    try:
+        datos = json.loads(raw)
+    except ValueError:
+        return raw  # "No hay parte diario.", errores...
+    incidencias = datos.get("incidencias") or []
+    otras = datos.get("otras_lineas") or []
+    datos.update(_affected(incidencias, incidents.build_index(incidencias), lineas))
+    datos["otras_lineas"] = sorted({*datos["otras_lineas"], *otras})
+    return compact(datos)
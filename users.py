@@ -0,0 +1,65 @@
+# users.py
+import contextvars
+import json
+import os
+import re
+from contextlib import contextmanager
+from typing import List, Optional
+
+from config import USERS_FILE, CACHE_DIR
+
+_usuario = contextvars.ContextVar("usuario", default=None)
+
+# Campos de lista y su separador cuando vienen como texto
+LISTAS = {"watchlist": ",", "news_queries": ";", "transport_lines": ",",
+          "email_allow": ",", "email_block": ",", "email_keywords": ","}
+
+# El id acaba en rutas (.cache/users/<id>.db, tokens/<id>.json): nada de separadores ni ".."
+_ID = re.compile(r"[A-Za-z0-9_.-]+")
+
+def _normalize(u: dict) -> dict:
+    u = dict(u)
+    if u.get("id") is not None and (not _ID.fullmatch(str(u["id"])) or u["id"] in (".", "..")):
+        raise ValueError(f"id de usuario no válido: {u['id']!r} (solo letras, dígitos, '_', '.' y '-')")
+    for clave, sep in LISTAS.items():
+        valor = u.get(clave)
+        if isinstance(valor, str): valor = valor.split(sep)
+        if valor is not None: u[clave] = [v.strip() for v in valor if v.strip()]
+    if u.get("watchlist"): u["watchlist"] = [s.upper() for s in u["watchlist"]]
+    for clave in ("email_allow", "email_block"):
+        if u.get(clave): u[clave] = [s.lower() for s in u[clave]]
+    if u.get("id"): u.setdefault("token_file", os.path.join("tokens", f"{u['id']}.json"))
+    return u
+
+def load_users(ruta: str = USERS_FILE) -> List[dict]:
+    """Registro de usuarios (JSON): id, token_file, destinos de entrega y parámetros de sus fuentes."""
+    with open(ruta, encoding="utf-8") as f:
+        usuarios = [_normalize(u) for u in json.load(f)]
+    ids = [u.get("id") for u in usuarios]
+    if not all(ids) or len(set(ids)) != len(ids):
+        raise ValueError(f"{ruta}: cada usuario necesita un 'id' único")
+    return usuarios
+
+def current_user() -> Optional[dict]:
+    """Usuario del contexto actual (None en modo de un solo usuario)."""
+    return _usuario.get()
+
+@contextmanager
+def use(usuario: dict):
+    """Ejecuta el bloque en nombre de `usuario` (los pools lo heredan vía profiling.propagate)."""
+    token = _usuario.set(_normalize(usuario))
+    try:
+        yield
+    finally:
+        _usuario.reset(token)
+
+def setting(clave: str, default=None):
+    """Valor del usuario actual o, si no lo define, el global (config/.env)."""
+    u = _usuario.get()
+    if u and u.get(clave) not in (None, "", []): return u[clave]
+    return default
+
+def db_path() -> Optional[str]:
+    """Base SQLite privada del usuario actual (historial de Gmail, sync de Calendar/Tasks)."""
+    u = _usuario.get()
+    return os.path.join(CACHE_DIR, "users", f"{u['id']}.db") if u and u.get("id") else None